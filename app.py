@@ -2,16 +2,119 @@
 Vehicle Parking Management System 
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory, g, abort, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, MetaData, String, Table, create_engine, event, func, inspect, literal, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from markupsafe import Markup
+import click
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge, ServiceUnavailable, TooManyRequests
+from werkzeug.utils import safe_join
+from datetime import datetime, timedelta, timezone
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from multiprocessing import resource_tracker, shared_memory
+from urllib.parse import parse_qs
+import asyncio
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import logging
+import logging.handlers
+import math
+import mimetypes
 import os
+import queue
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # Only needed to serve the HTML app from the ASGI entry point
+    WSGIMiddleware = None
+
+try:
+    import brotli
+except ImportError:  # Assets and responses are then served gzip-only
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # The JSON API then uses a pre-built stdlib encoder
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, a thread lock is enough
+    fcntl = None
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///parking_app.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 4, 'max_overflow': 4}  # Writer pool
+app.config['READ_DATABASE_URI'] = None  # Replica URI; None opens the primary SQLite file read-only
+app.config['READ_POOL_SIZE'] = 16
+app.config['READ_YOUR_WRITES_SECONDS'] = 5  # Callers read from the writer this long after a commit
+app.config['RESERVATION_EXPIRY_ACTION'] = 'release'  # release or flag
+app.config['RESERVATION_EXPIRY_BATCH_SIZE'] = 500
+app.config['BOOKING_MAX_HOURS'] = 24 * 365  # Longest timed booking, and longest advance reservation
+app.config['ADVANCE_BOOKING_MAX_DAYS'] = 90  # How far ahead an advance reservation may start
+app.config['SPOT_INDEX_MAX_AGE'] = 60  # Seconds before the interval index is rebuilt to pick up other workers' bookings
+app.config['BATCH_MAX_OPERATIONS'] = 500
+app.config['IDEMPOTENCY_KEY_MAX_LENGTH'] = 100  # Matches IdempotencyKey.key
+app.config['ASYNC_API_DB_WORKERS'] = 4
+app.config['ASYNC_API_WSGI_THREADS'] = 16  # Threads running Flask routes behind the ASGI entry point
+app.config['OCCUPANCY_SHM_NAME'] = None  # None derives the name from the database path
+app.config['OCCUPANCY_MAX_SPOTS'] = 1_000_000  # Highest spot id the table can hold
+app.config['OCCUPANCY_MAX_LOTS'] = 65_536
+app.config['COMPRESS_MIN_SIZE'] = 1024  # Bytes; smaller HTML/JSON responses go out as-is
+app.config['COMPRESS_MIMETYPES'] = {'text/html', 'application/json'}
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = 8 * 1024 * 1024
+app.config['ADMISSION_CONTROL_ENABLED'] = True
+app.config['ADMISSION_MAX_CONCURRENT'] = 4  # Writers / password hashes running at once
+app.config['ADMISSION_MAX_QUEUE'] = 32
+app.config['ADMISSION_QUEUE_TIMEOUT'] = 2.0  # Seconds a request may wait for a slot
+app.config['RATE_LIMITS'] = {  # Per user and per IP: (requests per minute, burst)
+    'login': (10, 5),
+    'booking': (60, 20),
+    'import': (6, 2)
+}
+app.config['EVENT_SNAPSHOT_INTERVAL'] = 50_000  # Events between automatic state snapshots
+app.config['EVENT_SNAPSHOTS_KEEP'] = 3
+app.config['EVENT_FEED_PAGE_SIZE'] = 1000
+app.config['IMPORT_USERS_CHUNK_SIZE'] = 1000  # Users per bulk insert transaction
+app.config['IMPORT_HASH_WORKERS'] = None  # Password hashing processes; None uses every CPU
+app.config['IMPORT_PASSWORD_HASH_METHOD'] = 'scrypt'  # Werkzeug's default, as used by register
+app.config['IMPORT_USERS_MAX_BYTES'] = 16 * 1024 * 1024  # Largest upload the import page accepts
+app.config['TARIFF_UTC_OFFSET_MINUTES'] = 330  # Local time for peak hours, weekends and daily caps (IST)
+app.config['QUOTE_MAX_ITEMS'] = 10_000
+app.config['ACCESS_LOG_ENABLED'] = True
+app.config['AUDIT_LOG_ENABLED'] = True
+app.config['LOG_DIR'] = None  # None writes to <instance folder>/logs
+app.config['LOG_QUEUE_SIZE'] = 10_000  # Records buffered for the writer; newer ones are dropped past this
+app.config['LOG_BATCH_SIZE'] = 500
+app.config['LOG_FLUSH_INTERVAL'] = 0.5  # Seconds the writer waits to fill a batch
+app.config['LOG_MAX_BYTES'] = 50 * 1024 * 1024  # Rotate a log file past this size...
+app.config['LOG_ROTATE_INTERVAL'] = 24 * 3600  # ...or this many seconds after it was started
+app.config['LOG_BACKUP_COUNT'] = 14
+app.config['API_STREAM_MIN_ITEMS'] = 1000  # JSON lists at least this long are streamed in chunks
+app.config['API_STREAM_CHUNK_SIZE'] = 500
 
 db = SQLAlchemy(app)
 
@@ -33,6 +136,12 @@ class ParkingLot(db.Model):
     pin_code = db.Column(db.String(10), nullable=False)
     maximum_number_of_spots = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped on every edit
+    peak_price = db.Column(db.Float)  # Weekday rate inside the peak window; None for a flat rate
+    peak_start_hour = db.Column(db.Integer)  # Local hours, 0-24; a window may wrap past midnight
+    peak_end_hour = db.Column(db.Integer)
+    weekend_price = db.Column(db.Float)  # Saturday and Sunday rate; None uses the weekday rules
+    daily_cap = db.Column(db.Float)  # Most a stay is charged per local calendar day
     spots = db.relationship('ParkingSpot', backref='lot', lazy=True, cascade='all, delete-orphan')
 
 class ParkingSpot(db.Model):
@@ -44,13 +153,66 @@ class ParkingSpot(db.Model):
 
 class ReserveParkingSpot(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spot.id'), nullable=False)
+    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spot.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     parking_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     leaving_timestamp = db.Column(db.DateTime)
     parking_cost_per_hour = db.Column(db.Float, nullable=False)
     total_cost = db.Column(db.Float)
     is_active = db.Column(db.Boolean, default=True)
+    expires_at = db.Column(db.DateTime, index=True)  # None for open-ended bookings
+    overstayed = db.Column(db.Boolean, default=False)
+    tariff = db.Column(db.String(200))  # JSON tariff rules at booking; None bills the flat hourly rate
+
+class AdvanceReservation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spot.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False, index=True)
+    parking_cost_per_hour = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_active = db.Column(db.Boolean, default=True)  # False once cancelled or checked in
+    spot = db.relationship('ParkingSpot')
+    user = db.relationship('User')
+
+class IdempotencyKey(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    response = db.Column(db.Text, nullable=False)  # JSON result of the original operation
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('user_id', 'key'),)
+
+class BookingEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # Change feed cursor
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    kind = db.Column(db.String(16), nullable=False)
+    lot_id = db.Column(db.Integer)
+    spot_id = db.Column(db.Integer)
+    reservation_id = db.Column(db.Integer)  # Advance reservation id for hold events
+    user_id = db.Column(db.Integer)
+    at = db.Column(db.DateTime)  # Parking or leaving time, or hold start
+    until = db.Column(db.DateTime)  # Booking expiry or hold end
+    amount = db.Column(db.Float)  # Hourly rate when booked, total cost when released
+    data = db.Column(db.Text)  # JSON payload of lot and spot events, or a booking's tariff
+
+class StateSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, nullable=False, index=True)  # Last event the snapshot includes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    data = db.Column(db.LargeBinary, nullable=False)  # gzipped JSON rows per table
+
+class ImportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, running, done or failed
+    total = db.Column(db.Integer, nullable=False)  # Records in the upload
+    processed = db.Column(db.Integer, nullable=False, default=0)  # Records created or skipped so far
+    created = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Text)  # JSON list of skipped rows once done
+    error = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
 
 # Helper Functions
 def create_admin():
@@ -66,10 +228,142 @@ def create_admin():
         db.session.add(admin)
         db.session.commit()
 
+def upgrade_schema():
+    """Add columns and indexes that db.create_all() skips on tables that already exist"""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    added = []
+    with db.engine.begin() as conn:
+        preparer = conn.dialect.identifier_preparer
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            present = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                ddl = (f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN '
+                       f'{preparer.format_column(column)} {column.type.compile(conn.dialect)}')
+                if column.default is not None and column.default.is_scalar:
+                    # Existing rows take the model default, as new ones would
+                    default = literal(column.default.arg, column.type).compile(
+                        dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+                    ddl += f' DEFAULT {default}' + ('' if column.nullable else ' NOT NULL')
+                conn.execute(text(ddl))
+                added.append(f'{table.name}.{column.name}')
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    return added
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and add columns added since the database was created"""
+    db.create_all()
+    added = upgrade_schema()
+    print(f" Added {len(added)} columns{': ' + ', '.join(added) if added else ''}.")
+
 def is_admin():
     """Check if current user is admin"""
     return session.get('username') == 'admin'
 
+def close_reservation(reservation, leaving_time):
+    """Bill a reservation under its tariff and free its spot (caller commits)"""
+    total_cost = tariffs.bill(reservation_tariff(reservation), reservation.parking_timestamp, leaving_time)
+
+    reservation.leaving_timestamp = leaving_time
+    reservation.total_cost = total_cost
+    reservation.is_active = False
+    reservation.spot.status = 'A'
+    spot_index.remove(reservation.id)
+    return total_cost
+
+def parse_timestamp(value):
+    """ISO 8601 string -> naive UTC datetime; values with an offset are converted"""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def lock_lot(lot_id):
+    """Take the lot row's write lock for the rest of the transaction.
+
+    Bookings on a lot are serialised across worker processes by this, not by
+    spot_index.lock, which only covers the current process. Routes take it
+    before spot_index.lock, so index readers never wait behind a writer that
+    is itself waiting for SQLite.
+    """
+    db.session.execute(update(ParkingLot).where(ParkingLot.id == lot_id).values(
+        id=ParkingLot.id
+    ).execution_options(synchronize_session=False))
+
+def spot_taken_clause(spot_id, start, end):
+    """SQL test for an active hold or stay on spot_id overlapping [start, end); end None is open-ended"""
+    hold = [AdvanceReservation.spot_id == spot_id, AdvanceReservation.is_active == True,
+            AdvanceReservation.end_time > start]
+    stay = [ReserveParkingSpot.spot_id == spot_id, ReserveParkingSpot.is_active == True,
+            or_(ReserveParkingSpot.expires_at.is_(None), ReserveParkingSpot.expires_at > start)]
+    if end is not None:
+        hold.append(AdvanceReservation.start_time < end)
+        stay.append(ReserveParkingSpot.parking_timestamp < end)
+    return or_(select(AdvanceReservation.id).where(*hold).exists(),
+               select(ReserveParkingSpot.id).where(*stay).exists())
+
+def spot_window_taken(spot_id, start, end):
+    return db.session.scalar(select(spot_taken_clause(spot_id, start, end)))
+
+def free_spot_in_db(lot_id, start, end, available_only=False):
+    """First spot id in a lot with nothing booked in [start, end) according to the DB, or None"""
+    query = select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id, ~spot_taken_clause(ParkingSpot.id, start, end))
+    if available_only:
+        query = query.where(ParkingSpot.status == 'A')
+    return db.session.scalar(query.order_by(ParkingSpot.id).limit(1))
+
+def find_spot_for_hold(lot_id, start_time, end_time):
+    """Spot id free for an advance reservation, or None. Caller holds spot_index.lock.
+
+    The index proposes a spot and the DB confirms it under the lot's write lock;
+    if the two disagree, another process changed the lot and the index is rebuilt.
+    """
+    lock_lot(lot_id)
+    spot_id = spot_index.free_spot(lot_id, start_time, end_time)
+    if (spot_window_taken(spot_id, start_time, end_time) if spot_id is not None
+            else free_spot_in_db(lot_id, start_time, end_time) is not None):
+        spot_index.load()
+        spot_id = spot_index.free_spot(lot_id, start_time, end_time)
+    return spot_id
+
+def find_spot_for_stay(lot_id, parking_time, expires_at):
+    """Pick a free spot for a stay starting now, respecting advance reservations.
+
+    Returns (spot, expires_at). An open-ended stay may be given an expiry when
+    the only free spots are reserved later on. Caller holds spot_index.lock;
+    the pick is confirmed against the DB as in find_spot_for_hold.
+    """
+    lock_lot(lot_id)
+    spot, until = _pick_spot_for_stay(lot_id, parking_time, expires_at)
+    if (spot_window_taken(spot.id, parking_time, until) if spot is not None
+            else free_spot_in_db(lot_id, parking_time, expires_at, available_only=True) is not None):
+        spot_index.load()
+        spot, until = _pick_spot_for_stay(lot_id, parking_time, expires_at)
+    return spot, until
+
+def _pick_spot_for_stay(lot_id, parking_time, expires_at):
+    fallback_spot_id, fallback_until = None, None
+    spot_ids = db.session.query(ParkingSpot.id).filter_by(lot_id=lot_id, status='A').order_by(ParkingSpot.id)
+    for (spot_id,) in spot_ids:
+        if spot_index.is_free(lot_id, spot_id, parking_time, expires_at or datetime.max):
+            return db.session.get(ParkingSpot, spot_id), expires_at
+        if expires_at is None:
+            next_hold = spot_index.next_hold(lot_id, spot_id, parking_time)
+            if (next_hold and spot_index.is_free(lot_id, spot_id, parking_time, next_hold)
+                    and (fallback_until is None or next_hold > fallback_until)):
+                fallback_spot_id, fallback_until = spot_id, next_hold
+    
+    if fallback_spot_id is None:
+        return None, expires_at
+    # Open-ended stay on a spot reserved later on: it expires when the hold starts
+    return db.session.get(ParkingSpot, fallback_spot_id), fallback_until
+
 def login_required(f):
     """Decorator for login required routes"""
     from functools import wraps
@@ -78,6 +372,7 @@ def login_required(f):
         if 'user_id' not in session:
             flash('Please log in first.', 'error')
             return redirect(url_for('login'))
+        g.user_id = session['user_id']  # For the access and audit logs
         return f(*args, **kwargs)
     return decorated_function
 
@@ -92,12 +387,1923 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Tariff Engine
+_MONDAY = datetime(1970, 1, 5)
+
+class CompiledTariff:
+    """One set of tariff rules compiled into cost tables over a week of local hours.
+
+    Hour 0 is Monday 00:00. cost() prices a stay with a few lookups: the partial
+    first and last days come from the cumulative hourly table (each capped), and
+    the whole days between from cumulative capped day totals.
+    """
+
+    def __init__(self, rules):
+        rate, peak_price, peak_start, peak_end, weekend_price, daily_cap = rules
+        self.rates = []
+        for day in range(7):
+            for hour in range(24):
+                if day >= 5 and weekend_price is not None:
+                    self.rates.append(weekend_price)
+                elif day < 5 and peak_price is not None and self._in_window(hour, peak_start, peak_end):
+                    self.rates.append(peak_price)
+                else:
+                    self.rates.append(rate)
+        self.rates.append(0.0)  # So _at(168) can index one past the last hour
+        self.cumulative = [0.0]
+        for hourly in self.rates:
+            self.cumulative.append(self.cumulative[-1] + hourly)
+
+        self.cap = daily_cap if daily_cap is not None else float('inf')
+        day_totals = [min(self.cap, self.cumulative[24 * (d + 1)] - self.cumulative[24 * d]) for d in range(7)]
+        self.days = [0.0]
+        for total in day_totals * 2:  # Two weeks, so a run of days may wrap past Sunday
+            self.days.append(self.days[-1] + total)
+        self.week = self.days[7]
+
+    @staticmethod
+    def _in_window(hour, start, end):
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end  # Wraps past midnight
+
+    def _at(self, hour):
+        """Uncapped cost from Monday 00:00 to a week hour in [0, 168]"""
+        whole = int(hour)
+        return self.cumulative[whole] + (hour - whole) * self.rates[whole]
+
+    def cost(self, start, end):
+        """Cost between two local hour offsets from a Monday 00:00"""
+        first, last = int(start // 24), int(end // 24)
+        first_offset = (first // 7) * 168
+        if first == last:
+            return min(self.cap, self._at(end - first_offset) - self._at(start - first_offset))
+
+        total = min(self.cap, self._at((first % 7 + 1) * 24) - self._at(start - first_offset))
+        last_offset = (last // 7) * 168
+        total += min(self.cap, self._at(end - last_offset) - self._at((last % 7) * 24))
+        weeks, days = divmod(last - first - 1, 7)
+        day = (first + 1) % 7
+        return total + weeks * self.week + self.days[day + days] - self.days[day]
+
+class TariffEngine:
+    """Bills stays from compiled tariffs, cached per rule set (oldest evicted first)"""
+
+    def __init__(self, utc_offset_minutes, max_tables=1024):
+        self.offset_hours = utc_offset_minutes / 60
+        self.max_tables = max_tables
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compiled(self, rules):
+        table = self._tables.get(rules)  # Lock-free on hits; rule sets only change when a lot is edited
+        if table is None:
+            table = CompiledTariff(rules)
+            with self._lock:
+                self._tables[rules] = table
+                while len(self._tables) > self.max_tables:
+                    self._tables.popitem(last=False)
+        return table
+
+    def local_hours(self, dt):
+        """Naive UTC datetime -> local hours since Monday 1970-01-05 00:00"""
+        return (dt - _MONDAY).total_seconds() / 3600 + self.offset_hours
+
+    def bill(self, rules, start, end):
+        """Cost of a stay, rounded to paise"""
+        start_hour = self.local_hours(start)
+        end_hour = max(self.local_hours(end), start_hour + 1)  # Minimum 1 hour
+        return round(self.compiled(rules).cost(start_hour, end_hour), 2)
+
+tariffs = TariffEngine(app.config['TARIFF_UTC_OFFSET_MINUTES'])
+
+def lot_tariff(lot, rate=None):
+    """Hashable tariff rules of a lot; rate replaces its base price (e.g. one locked in by a hold)"""
+    return (lot.price if rate is None else rate, lot.peak_price, lot.peak_start_hour, lot.peak_end_hour,
+            lot.weekend_price, lot.daily_cap)
+
+def reservation_tariff(reservation):
+    """Rules a reservation was booked under; older reservations pay their flat hourly rate"""
+    if reservation.tariff:
+        return tuple(json.loads(reservation.tariff))
+    return (reservation.parking_cost_per_hour, None, None, None, None, None)
+
+def tariff_form_fields(form):
+    """Optional tariff columns from the lot form (raises ValueError)"""
+    def optional_price(name):
+        value = form.get(name, '').strip()
+        if not value:
+            return None
+        if float(value) < 0:
+            raise ValueError('prices cannot be negative')
+        return float(value)
+
+    fields = {name: optional_price(name) for name in ('peak_price', 'weekend_price', 'daily_cap')}
+    fields['peak_start_hour'] = fields['peak_end_hour'] = None
+    if fields['peak_price'] is not None:
+        start, end = int(form.get('peak_start_hour', '')), int(form.get('peak_end_hour', ''))
+        if not (0 <= start <= 24 and 0 <= end <= 24) or start == end:
+            raise ValueError('peak hours must be two different hours from 0 to 24')
+        fields['peak_start_hour'], fields['peak_end_hour'] = start, end
+    return fields
+
+# Spot Interval Index
+_EPOCH = datetime(1970, 1, 1)
+
+def _ts(dt):
+    """Naive UTC datetime -> float seconds (datetime.max/None -> +inf)"""
+    if dt is None or dt == datetime.max:
+        return float('inf')
+    return (dt - _EPOCH).total_seconds()
+
+class SpotTimeline:
+    """Non-overlapping [start, end) intervals booked on one spot, sorted by start.
+
+    Because intervals never overlap, ends are sorted too, so an overlap test
+    only needs the last interval starting before the query end.
+    """
+    __slots__ = ('starts', 'ends', 'keys')
+
+    def __init__(self):
+        self.starts = array('d')
+        self.ends = array('d')
+        self.keys = array('q')
+
+    def overlaps(self, start, end):
+        i = bisect_left(self.starts, end)
+        return i > 0 and self.ends[i - 1] > start
+
+    def next_start(self, after):
+        i = bisect_right(self.starts, after)
+        return self.starts[i] if i < len(self.starts) else None
+
+    def insert(self, start, end, key):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.keys.insert(i, key)
+
+    def remove(self, start, key):
+        i = bisect_left(self.starts, start)
+        while i < len(self.keys) and self.keys[i] != key:
+            i += 1
+        if i < len(self.keys):
+            del self.starts[i], self.ends[i], self.keys[i]
+
+class SpotIntervalIndex:
+    """Per-lot index of the time windows each spot is taken.
+
+    Holds both current stays (key = reservation id) and advance reservations
+    (key = -advance reservation id); open-ended stays run to +inf. Built
+    lazily from the DB, kept in sync by this process's booking routes and
+    rebuilt every SPOT_INDEX_MAX_AGE seconds for other processes' changes.
+    It only proposes spots: writers confirm them in SQL (find_spot_for_hold).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.RLock()
+        self._lots = {}  # lot_id -> {spot_id: SpotTimeline}
+        self._entries = {}  # key -> (lot_id, spot_id, start)
+        self._loaded = False
+        self._loaded_at = 0
+        self._journals = []  # Changes made while a rebuild reads the DB, replayed onto it
+        self._refreshing = threading.Lock()
+
+    def invalidate(self):
+        """Force a rebuild from the DB on next use (e.g. after a rolled back batch)"""
+        with self.lock:
+            self._loaded = False
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self.lock:
+                if not self._loaded:
+                    self.load()
+        elif (time.monotonic() - self._loaded_at > self.app.config['SPOT_INDEX_MAX_AGE']
+                and self._refreshing.acquire(blocking=False)):
+            # Writers confirm against the DB anyway; the age limit bounds how stale reads get
+            threading.Thread(target=self._refresh, name='spot-index-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.load()
+        except Exception:
+            self.app.logger.exception('Failed to rebuild the spot interval index')
+            self._loaded_at = time.monotonic()
+        finally:
+            self._refreshing.release()
+
+    def load(self):
+        now = datetime.utcnow()
+        journal = []
+        with self.lock:
+            self._journals.append(journal)
+        try:
+            lots, entries = self._read(now)
+        finally:
+            with self.lock:
+                self._journals.remove(journal)
+        
+        with self.lock:
+            self._lots = lots
+            self._entries = entries
+            for change, args in journal:
+                change(*args)
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+
+    def _read(self, now):
+        with self.app.app_context():
+            spots = db.session.query(ParkingSpot.id, ParkingSpot.lot_id).all()
+            stays = db.session.query(
+                ReserveParkingSpot.id, ParkingSpot.id, ParkingSpot.lot_id,
+                ReserveParkingSpot.parking_timestamp, ReserveParkingSpot.expires_at
+            ).join(ParkingSpot, ReserveParkingSpot.spot_id == ParkingSpot.id).filter(
+                ReserveParkingSpot.is_active == True
+            ).all()
+            holds = db.session.query(
+                AdvanceReservation.id, ParkingSpot.id, ParkingSpot.lot_id,
+                AdvanceReservation.start_time, AdvanceReservation.end_time
+            ).join(ParkingSpot, AdvanceReservation.spot_id == ParkingSpot.id).filter(
+                AdvanceReservation.is_active == True,
+                AdvanceReservation.end_time > now
+            ).all()
+
+        pending = {}
+        for spot_id, lot_id in spots:
+            pending.setdefault(lot_id, {})[spot_id] = []
+        entries = {}
+        rows = [(rid, spot_id, lot_id, start, end) for rid, spot_id, lot_id, start, end in stays]
+        rows += [(-hid, spot_id, lot_id, start, end) for hid, spot_id, lot_id, start, end in holds]
+        for key, spot_id, lot_id, start, end in rows:
+            start = _ts(start)
+            pending.setdefault(lot_id, {}).setdefault(spot_id, []).append((start, _ts(end), key))
+            entries[key] = (lot_id, spot_id, start)
+
+        lots = {}
+        for lot_id, spot_rows in pending.items():
+            timelines = lots[lot_id] = {}
+            for spot_id, intervals in spot_rows.items():
+                timeline = timelines[spot_id] = SpotTimeline()
+                intervals.sort()
+                for start, end, key in intervals:
+                    timeline.starts.append(start)
+                    timeline.ends.append(end)
+                    timeline.keys.append(key)
+        return lots, entries
+
+    def _change(self, change, *args):
+        if self._loaded:
+            with self.lock:
+                for journal in self._journals:
+                    journal.append((change, args))
+                change(*args)
+
+    def add_spot(self, lot_id, spot_id):
+        self._change(self._add_spot, lot_id, spot_id)
+
+    def drop_spot(self, lot_id, spot_id):
+        self._change(self._drop_spot, lot_id, spot_id)
+
+    def drop_lot(self, lot_id):
+        self._change(self._drop_lot, lot_id)
+
+    def add(self, key, lot_id, spot_id, start, end):
+        self._change(self._add, key, lot_id, spot_id, start, end)
+
+    def remove(self, key):
+        self._change(self._remove, key)
+
+    def _add_spot(self, lot_id, spot_id):
+        self._lots.setdefault(lot_id, {}).setdefault(spot_id, SpotTimeline())
+
+    def _drop_spot(self, lot_id, spot_id):
+        timeline = self._lots.get(lot_id, {}).pop(spot_id, None)
+        for key in timeline.keys if timeline else ():
+            self._entries.pop(key, None)
+
+    def _drop_lot(self, lot_id):
+        for spot_id in list(self._lots.get(lot_id, {})):
+            self._drop_spot(lot_id, spot_id)
+        self._lots.pop(lot_id, None)
+
+    def _add(self, key, lot_id, spot_id, start, end):
+        if key in self._entries:
+            return  # A rebuild already read it from the DB
+        start = _ts(start)
+        self._lots.setdefault(lot_id, {}).setdefault(spot_id, SpotTimeline()).insert(start, _ts(end), key)
+        self._entries[key] = (lot_id, spot_id, start)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            lot_id, spot_id, start = entry
+            timeline = self._lots.get(lot_id, {}).get(spot_id)
+            if timeline:
+                timeline.remove(start, key)
+
+    def is_free(self, lot_id, spot_id, start, end):
+        self.ensure_loaded()
+        timeline = self._lots.get(lot_id, {}).get(spot_id)
+        return timeline is None or not timeline.overlaps(_ts(start), _ts(end))
+
+    def next_hold(self, lot_id, spot_id, after):
+        """Start of the next booked window on a spot after a time, or None"""
+        self.ensure_loaded()
+        timeline = self._lots.get(lot_id, {}).get(spot_id)
+        start = timeline.next_start(_ts(after)) if timeline else None
+        return _EPOCH + timedelta(seconds=start) if start is not None else None
+
+    def free_spot(self, lot_id, start, end):
+        """First spot id in a lot with nothing booked in [start, end), or None"""
+        self.ensure_loaded()
+        start, end = _ts(start), _ts(end)
+        with self.lock:
+            for spot_id, timeline in self._lots.get(lot_id, {}).items():
+                if not timeline.overlaps(start, end):
+                    return spot_id
+        return None
+
+    def lots_with_free_spot(self, start, end):
+        """Map lot id -> a spot id that is free for the whole window"""
+        self.ensure_loaded()
+        result = {}
+        with self.lock:
+            for lot_id in list(self._lots):
+                spot_id = self.free_spot(lot_id, start, end)
+                if spot_id is not None:
+                    result[lot_id] = spot_id
+        return result
+
+spot_index = SpotIntervalIndex(app)
+
+# Reservation Expiry Scheduler
+class ExpiryScheduler:
+    """Background thread that releases (or flags) timed reservations when they expire.
+
+    Pending deadlines are kept in a min-heap, so the thread sleeps until the
+    next expiry is due instead of polling the reservation table. Cancelled
+    entries are dropped lazily when they reach the top of the heap. Keys are
+    those of the spot index: reservation ids, and -id for advance reservations,
+    which lapse at their end time if never checked in.
+    """
+
+    def __init__(self, app, batch_size=500):
+        self.app = app
+        self.batch_size = batch_size
+        self._heap = []
+        self._deadlines = {}  # reservation_id -> expires_at
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._pid = None
+
+    def ensure_started(self):
+        """Load and start once per serving process (a forked worker gets its own thread)"""
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = None  # Threads don't survive a fork
+        self.load()
+        self.start()
+
+    def load(self):
+        """Seed the heap from active timed reservations (uses the expires_at index)"""
+        with self.app.app_context():
+            rows = db.session.query(ReserveParkingSpot.id, ReserveParkingSpot.expires_at).filter(
+                ReserveParkingSpot.is_active == True,
+                ReserveParkingSpot.overstayed == False,
+                ReserveParkingSpot.expires_at.isnot(None)
+            ).all()
+            rows += [(-hold_id, end_time) for hold_id, end_time in db.session.query(
+                AdvanceReservation.id, AdvanceReservation.end_time
+            ).filter(AdvanceReservation.is_active == True)]
+        with self._cond:
+            self._deadlines = {reservation_id: expires_at for reservation_id, expires_at in rows}
+            self._heap = [(expires_at, reservation_id) for reservation_id, expires_at in rows]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def schedule(self, reservation_id, expires_at):
+        with self._cond:
+            self._deadlines[reservation_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, reservation_id))
+            if self._heap[0][1] == reservation_id:
+                self._cond.notify()
+
+    def cancel(self, reservation_id):
+        with self._cond:
+            if self._deadlines.pop(reservation_id, None) is not None:
+                # Compact once stale entries dominate the heap
+                if len(self._heap) > 2 * len(self._deadlines) + 64:
+                    self._heap = [(expires_at, rid) for rid, expires_at in self._deadlines.items()]
+                    heapq.heapify(self._heap)
+
+    def pending(self):
+        with self._cond:
+            return len(self._deadlines)
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='expiry-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def pop_due(self, now):
+        """Remove and return up to batch_size keys whose deadline has passed"""
+        due = []
+        with self._cond:
+            while self._heap and len(due) < self.batch_size:
+                expires_at, reservation_id = self._heap[0]
+                if self._deadlines.get(reservation_id) != expires_at:
+                    heapq.heappop(self._heap)  # cancelled or rescheduled
+                    continue
+                if expires_at > now:
+                    break
+                heapq.heappop(self._heap)
+                del self._deadlines[reservation_id]
+                due.append(reservation_id)
+        return due
+
+    def expire(self, keys):
+        """Release or flag a batch of expired reservations and lapse holds in one transaction"""
+        pending = (
+            ReserveParkingSpot.id.in_([key for key in keys if key > 0]),
+            ReserveParkingSpot.is_active == True,
+            ReserveParkingSpot.overstayed == False
+        )
+        lapsed = (
+            AdvanceReservation.id.in_([-key for key in keys if key < 0]),
+            AdvanceReservation.is_active == True
+        )
+        with self.app.app_context():
+            # Every worker runs a scheduler: a no-op UPDATE takes the rows' write lock first,
+            # so a batch another process is expiring is only read once that one has committed
+            db.session.execute(update(ReserveParkingSpot).where(*pending).values(
+                expires_at=ReserveParkingSpot.expires_at
+            ).execution_options(synchronize_session=False))
+            db.session.execute(update(AdvanceReservation).where(*lapsed).values(
+                end_time=AdvanceReservation.end_time
+            ).execution_options(synchronize_session=False))
+            reservations = ReserveParkingSpot.query.filter(*pending).all()
+            holds = AdvanceReservation.query.filter(*lapsed).all()
+            for reservation in reservations:
+                if self.app.config['RESERVATION_EXPIRY_ACTION'] == 'release':
+                    close_reservation(reservation, reservation.expires_at)
+                else:
+                    reservation.overstayed = True
+            for hold in holds:
+                hold.is_active = False
+                spot_index.remove(-hold.id)
+            db.session.commit()
+            return len(reservations) + len(holds)
+
+    def _wait_for_next(self):
+        with self._cond:
+            while not self._stopping:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                if delay <= 0:
+                    return True
+                self._cond.wait(timeout=delay)
+            return False
+
+    def _run(self):
+        while self._wait_for_next():
+            due = self.pop_due(datetime.utcnow())
+            if not due:
+                continue
+            try:
+                self.expire(due)
+            except Exception:
+                self.app.logger.exception('Failed to expire reservations %s', due)
+
+expiry_scheduler = ExpiryScheduler(app, batch_size=app.config['RESERVATION_EXPIRY_BATCH_SIZE'])
+
+def start_expiry_scheduler():
+    """Load pending expiries from the DB and start the background thread, once per process"""
+    expiry_scheduler.ensure_started()
+
+@app.before_request
+def start_background_services():
+    # gunicorn/uvicorn never run __main__; each worker starts its scheduler on its first request
+    start_expiry_scheduler()
+
+# Shared-memory Occupancy Table
+class OccupancyTable:
+    """Spot status and per-lot counters in shared memory, common to all worker processes.
+
+    Layout: a 16-byte header, one status byte per spot id ('A', 'O' or 0 for
+    no spot), then an (available, occupied) int32 pair per lot id. Readers
+    never lock; writers serialise on an flock'd file and apply the spot
+    status changes of each flush while their transaction still holds SQLite's
+    write lock, so changes land in commit order. A transaction that rolls back
+    afterwards re-reads its spots from the DB. Rebuilds also take the write
+    lock, so no writer sits between applying and committing while they read.
+    The segment is named after the database file, and every process rebuilds
+    it from the spot table when it attaches, so a segment left over from a
+    deleted database is never trusted.
+    """
+
+    MAGIC = b'PKOC'
+    HEADER = struct.Struct('4sBBxxQ')  # magic, ready, overflow, generation
+
+    def __init__(self, app):
+        self.app = app
+        self._shm = None
+        self._spots = None
+        self._counters = None
+        self._attach_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+
+    def _name(self):
+        if self.app.config['OCCUPANCY_SHM_NAME']:
+            return self.app.config['OCCUPANCY_SHM_NAME']
+        with self.app.app_context():
+            database = os.path.abspath(db.engine.url.database or ':memory:')
+        return 'parking_occupancy_' + hashlib.sha1(database.encode()).hexdigest()[:12]
+
+    def _open(self, conn=None):
+        name = self._name()
+        max_spots = self.app.config['OCCUPANCY_MAX_SPOTS'] + 1  # Indexed by id
+        max_lots = self.app.config['OCCUPANCY_MAX_LOTS'] + 1
+        size = self.HEADER.size + max_spots + 8 * max_lots
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            created = True
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=name)
+            created = False
+        # The segment outlives any single worker; don't let this process unlink it on exit
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        
+        self._shm = shm
+        self._spots = shm.buf[self.HEADER.size:self.HEADER.size + max_spots]
+        self._counters = shm.buf[self.HEADER.size + max_spots:size].cast('i')
+        self._lock_file = open(os.path.join(self.app.instance_path, f'{name}.lock'), 'a+b')
+        # Rebuilt on every attach: a segment can outlive its database, and with only
+        # one spot table scan per worker start the cost is the same as checking it
+        self._rebuild(conn)
+
+    def _ensure_open(self, force_rebuild=False, conn=None):
+        if self._shm is None:
+            with self._attach_lock:
+                if self._shm is None:
+                    os.makedirs(self.app.instance_path, exist_ok=True)
+                    self._open(conn)
+        elif force_rebuild:
+            self._rebuild()
+        _, ready, overflow, _ = self.HEADER.unpack_from(self._shm.buf)
+        return ready and not overflow  # Unusable while a rebuild runs (or after one failed)
+
+    def open(self):
+        """Attach to (or create) the segment now rather than on first use"""
+        self._ensure_open()
+
+    @contextmanager
+    def _db_write_lock(self, conn=None):
+        """A connection holding SQLite's write lock: conn itself if the caller's transaction already does"""
+        if conn is not None:
+            yield conn
+            return
+        with self.app.app_context(), db.engine.connect() as conn:
+            # A no-op UPDATE takes the write lock even when it matches nothing
+            conn.execute(update(ParkingSpot).where(ParkingSpot.id < 0).values(status=ParkingSpot.status))
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+
+    @contextmanager
+    def _write_lock(self):
+        with self._thread_lock:
+            if fcntl:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def rebuild(self):
+        """Reload every spot status and lot counter from the DB"""
+        self._ensure_open(force_rebuild=True)
+
+    def _rebuild(self, conn=None):
+        # Holding SQLite's write lock, every applied change is committed and none can
+        # be applied while the spot table is read and copied in (same lock order as apply)
+        with self._db_write_lock(conn) as conn, self._write_lock():
+            rows = conn.execute(select(ParkingSpot.id, ParkingSpot.lot_id, ParkingSpot.status)).all()
+            
+            spots = bytearray(len(self._spots))
+            counters = array('i', bytes(len(self._counters) * 4))
+            available = ord('A')
+            overflow = 0
+            for spot_id, lot_id, status in rows:
+                if spot_id >= len(spots) or 2 * lot_id + 1 >= len(counters):
+                    overflow = 1
+                    continue
+                status = ord(status) if status else available
+                spots[spot_id] = status
+                counters[2 * lot_id + (status != available)] += 1
+            
+            _, _, _, generation = self.HEADER.unpack_from(self._shm.buf)
+            self.HEADER.pack_into(self._shm.buf, 0, self.MAGIC, 0, 0, generation + 1)
+            self._spots[:] = spots
+            self._counters[:] = counters
+            self.HEADER.pack_into(self._shm.buf, 0, self.MAGIC, 1, overflow, generation + 1)
+        
+        if overflow:
+            self.app.logger.warning('Occupancy table too small, falling back to DB counts')
+
+    def apply(self, changes, conn):
+        """Apply (spot_id, lot_id, new_status or None if deleted) changes flushed on conn.
+
+        conn's transaction must hold SQLite's write lock, so concurrent writers
+        apply in the order they commit.
+        """
+        if not changes or not self._ensure_open(conn=conn):
+            return
+        with self._write_lock():
+            self._set(changes)
+
+    def _set(self, changes):
+        for spot_id, lot_id, status in changes:
+            if spot_id >= len(self._spots) or 2 * lot_id + 1 >= len(self._counters):
+                struct.pack_into('B', self._shm.buf, 5, 1)  # Overflow: readers fall back to the DB
+                continue
+            old = self._spots[spot_id]
+            if old:
+                self._counters[2 * lot_id + (0 if old == ord('A') else 1)] -= 1
+            new = ord(status) if status else 0
+            self._spots[spot_id] = new
+            if new:
+                self._counters[2 * lot_id + (0 if new == ord('A') else 1)] += 1
+
+    def revert(self, changes):
+        """Restore the committed status of the spots in changes a rolled back transaction applied"""
+        if not changes or not self._ensure_open():
+            return
+        spot_ids = {spot_id for spot_id, _, _ in changes}
+        with self._db_write_lock() as conn, self._write_lock():
+            committed = {spot_id: (lot_id, status) for spot_id, lot_id, status in conn.execute(
+                select(ParkingSpot.id, ParkingSpot.lot_id, ParkingSpot.status).where(ParkingSpot.id.in_(spot_ids))
+            )}
+            # A spot missing from the DB (e.g. a rolled back insert) is dropped from its lot
+            lot_ids = {spot_id: lot_id for spot_id, lot_id, _ in changes}
+            self._set([(spot_id, *committed.get(spot_id, (lot_ids[spot_id], None))) for spot_id in spot_ids])
+
+    def counts(self, lot_ids):
+        """{lot_id: (available, occupied)} read without locking, or None if unusable"""
+        if not self._ensure_open():
+            return None
+        counters = self._counters
+        result = {}
+        for lot_id in lot_ids:
+            if 2 * lot_id + 1 >= len(counters):
+                return None
+            available, occupied = counters[2 * lot_id], counters[2 * lot_id + 1]
+            if available < 0 or occupied < 0:
+                return None  # Out of step with the DB; caller falls back
+            result[lot_id] = (available, occupied)
+        return result
+
+occupancy = OccupancyTable(app)
+
+@event.listens_for(db.session, 'after_flush')
+def _publish_spot_changes(session, flush_context):
+    """Apply a flush's spot status changes while its transaction holds the write lock"""
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, ParkingSpot):
+            changes.append((obj.id, obj.lot_id, obj.status or 'A'))
+    for obj in session.dirty:
+        if isinstance(obj, ParkingSpot) and inspect(obj).attrs.status.history.has_changes():
+            changes.append((obj.id, obj.lot_id, obj.status))
+    for obj in session.deleted:
+        if isinstance(obj, ParkingSpot):
+            changes.append((obj.id, obj.lot_id, None))
+    if changes:
+        session.info.setdefault('spot_changes', []).extend(changes)  # Reverted if the transaction rolls back
+        try:
+            occupancy.apply(changes, session.connection())
+        except Exception:
+            app.logger.exception('Failed to update occupancy table')
+
+@event.listens_for(db.session, 'after_commit')
+def _forget_spot_changes(session):
+    session.info.pop('spot_changes', None)
+
+@event.listens_for(db.session, 'after_rollback')
+def _revert_spot_changes(session):
+    changes = session.info.pop('spot_changes', None)
+    if changes:
+        try:
+            occupancy.revert(changes)
+        except Exception:
+            app.logger.exception('Failed to revert occupancy table')
+
+def available_spot_counts(lot_ids):
+    """{lot_id: (available, occupied)} from the occupancy table, or the DB if it is unusable"""
+    lot_ids = list(lot_ids)
+    try:
+        counts = occupancy.counts(lot_ids)
+    except Exception:
+        app.logger.exception('Occupancy table unavailable')
+        counts = None
+    if counts is not None:
+        return counts
+    
+    counts = {lot_id: (0, 0) for lot_id in lot_ids}
+    rows = read_db().query(ParkingSpot.lot_id, ParkingSpot.status, func.count()).group_by(
+        ParkingSpot.lot_id, ParkingSpot.status
+    ).all()
+    for lot_id, status, count in rows:
+        if lot_id in counts:
+            available, occupied = counts[lot_id]
+            counts[lot_id] = (available + count, occupied) if status == 'A' else (available, occupied + count)
+    return counts
+
+@app.cli.command('rebuild-occupancy')
+def rebuild_occupancy_command():
+    """Rebuild the shared-memory occupancy table from the DB"""
+    occupancy.rebuild()
+    print(' Occupancy table rebuilt from the database.')
+
+# Static Asset Pipeline
+ASSET_VENDOR_DIR = os.path.join(app.static_folder, 'vendor')
+ASSET_DIST_DIR = os.path.join(app.static_folder, 'dist')
+ASSET_PRECOMPRESS_EXTENSIONS = {'.css', '.js', '.svg', '.ttf'}  # woff2 is already compressed
+_CSS_URL = re.compile(r'url\((["\']?)([^)"\']+)\1\)')
+_SOURCE_MAP_COMMENT = re.compile(rb'\n?(//# sourceMappingURL=\S+|/\*# sourceMappingURL=\S+ \*/)\s*$')
+_asset_manifest = None
+
+def build_assets():
+    """Fingerprint and precompress static/vendor into static/dist; returns the manifest"""
+    vendor_files = sorted(
+        os.path.relpath(os.path.join(root, name), ASSET_VENDOR_DIR).replace(os.sep, '/')
+        for root, _, names in os.walk(ASSET_VENDOR_DIR) for name in names
+        if not name.startswith(('.', 'LICENSE'))
+    )
+    # Stylesheets last, so the files they reference already have fingerprinted names
+    vendor_files.sort(key=lambda name: name.endswith('.css'))
+    
+    manifest = {}
+    for name in vendor_files:
+        with open(os.path.join(ASSET_VENDOR_DIR, name), 'rb') as f:
+            content = f.read()
+        if name.endswith(('.css', '.js')):
+            content = _SOURCE_MAP_COMMENT.sub(b'', content)  # Maps aren't shipped
+        if name.endswith('.css'):
+            content = _rewrite_css_urls(name, content.decode('utf-8'), manifest).encode('utf-8')
+        
+        stem, ext = os.path.splitext(name)
+        fingerprinted = f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+        path = os.path.join(ASSET_DIST_DIR, fingerprinted)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if ext in ASSET_PRECOMPRESS_EXTENSIONS:
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(content, quality=11))
+        manifest[name] = fingerprinted
+    
+    # Drop files from earlier builds
+    keep = {os.path.join(ASSET_DIST_DIR, name) + suffix for name in manifest.values() for suffix in ('', '.gz', '.br')}
+    for root, _, names in os.walk(ASSET_DIST_DIR):
+        for name in names:
+            if os.path.join(root, name) not in keep and name != 'manifest.json':
+                os.remove(os.path.join(root, name))
+    
+    with open(os.path.join(ASSET_DIST_DIR, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    
+    global _asset_manifest
+    _asset_manifest = manifest
+    return manifest
+
+def _rewrite_css_urls(name, css, manifest):
+    """Point relative url()s in a vendored stylesheet at their fingerprinted files"""
+    css_dir = os.path.dirname(name)
+
+    def replace(match):
+        url = match.group(2)
+        path, _, suffix = url.partition('?')
+        target = os.path.normpath(os.path.join(css_dir, path)).replace(os.sep, '/')
+        if target not in manifest:
+            return match.group(0)
+        relative = os.path.relpath(manifest[target], css_dir)  # dist mirrors the vendor layout
+        return f'url({relative.replace(os.sep, "/")}{"?" + suffix if suffix else ""})'
+
+    return _CSS_URL.sub(replace, css)
+
+@app.template_global()
+def asset_url(name):
+    """URL of a vendored asset: fingerprinted if built, the plain vendor file otherwise"""
+    global _asset_manifest
+    if _asset_manifest is None:
+        try:
+            with open(os.path.join(ASSET_DIST_DIR, 'manifest.json')) as f:
+                _asset_manifest = json.load(f)
+        except (OSError, ValueError):
+            _asset_manifest = {}
+    if name in _asset_manifest:
+        return url_for('dist_asset', filename=_asset_manifest[name])
+    return url_for('static', filename=f'vendor/{name}')
+
+def negotiate_encoding():
+    """Best content coding we can produce that the client accepts, or None"""
+    accepted = request.accept_encodings
+    if brotli and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+@app.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    encoding = negotiate_encoding()
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding)
+    precompressed = safe_join(ASSET_DIST_DIR, filename + suffix) if suffix else None
+    
+    if precompressed and os.path.isfile(precompressed):
+        response = send_from_directory(ASSET_DIST_DIR, filename + suffix,
+                                       mimetype=mimetypes.guess_type(filename)[0])
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(ASSET_DIST_DIR, filename)
+    
+    # Names change whenever content does, so caches may keep these forever
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress dynamic HTML/JSON bodies above COMPRESS_MIN_SIZE"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in app.config['COMPRESS_MIMETYPES']):
+        return response
+    
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=5))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(data, compresslevel=6))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress the vendored static assets"""
+    manifest = build_assets()
+    print(f' Built {len(manifest)} assets into {ASSET_DIST_DIR}')
+
+# Rendered Fragment Cache
+class FragmentCache:
+    """LRU cache of rendered per-lot HTML fragments (dashboard cards and rows).
+
+    Entries are keyed by (template, lot id) and tagged with the lot's version
+    and spot counts, so an edit, booking or release in any worker makes the
+    next lookup miss. Evicts least recently used entries past max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (template, lot_id) -> (tag, html, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, tag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != tag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, tag, html):
+        size = len(html.encode('utf-8'))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (tag, html, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def discard_lot(self, lot_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == lot_id]:
+                self._bytes -= self._entries.pop(key)[2]
+
+    def render_lots(self, template, lots, availability):
+        """Fragments for (lot_id, version) rows in order; only misses are loaded and rendered"""
+        fragments, missing = {}, {}
+        for lot_id, version in lots:
+            tag = (version, availability[lot_id])
+            html = self.get((template, lot_id), tag)
+            if html is None:
+                missing[lot_id] = tag
+            else:
+                fragments[lot_id] = html
+        
+        if missing:
+            for lot in read_db().query(ParkingLot).filter(ParkingLot.id.in_(list(missing))):
+                html = Markup(render_template(template, lot=lot, available_spots=availability[lot.id][0]))
+                self.put((template, lot.id), missing[lot.id], html)
+                fragments[lot.id] = html
+        return [fragments[lot_id] for lot_id, _ in lots if lot_id in fragments]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_MAX_BYTES'])
+
+# Admission Control
+class AdmissionController:
+    """Bounds concurrent writers and rate-limits callers of the expensive routes.
+
+    At most max_concurrent guarded requests run at once; up to max_queue more
+    wait (for queue_timeout seconds at most) and anything beyond that is turned
+    away immediately, so a surge degrades into fast 503s rather than every
+    request timing out. Per-user and per-IP token buckets answer 429 first.
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout, max_buckets=100_000):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_buckets = max_buckets
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+        self._buckets = OrderedDict()  # key -> (tokens, last refill)
+        self.admitted = self.rejected_queue_full = self.rejected_timeout = self.rate_limited = 0
+
+    def take_token(self, key, per_minute, burst):
+        """0 if the caller may proceed, otherwise seconds until its bucket refills a token"""
+        rate = per_minute / 60
+        now = time.monotonic()
+        with self._cond:
+            tokens, last = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+                self.rate_limited += 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def enter(self):
+        """Take a writer slot, waiting in the bounded queue if needed; False if refused"""
+        with self._cond:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                return False
+            
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'waiting': self.waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_timeout': self.rejected_timeout,
+                'rate_limited': self.rate_limited,
+                'tracked_callers': len(self._buckets)
+            }
+
+admission = AdmissionController(
+    app.config['ADMISSION_MAX_CONCURRENT'],
+    app.config['ADMISSION_MAX_QUEUE'],
+    app.config['ADMISSION_QUEUE_TIMEOUT']
+)
+
+def admission_controlled(kind, methods=None):
+    """Decorator applying rate limits and the writer cap to a route"""
+    from functools import wraps
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not app.config['ADMISSION_CONTROL_ENABLED'] or (methods and request.method not in methods):
+                return f(*args, **kwargs)
+            
+            per_minute, burst = app.config['RATE_LIMITS'][kind]
+            callers = [f'ip:{request.remote_addr}']
+            if 'user_id' in session:
+                callers.append(f"user:{session['user_id']}")
+            for caller in callers:
+                wait = admission.take_token(f'{kind}:{caller}', per_minute, burst)
+                if wait:
+                    raise TooManyRequests(retry_after=math.ceil(wait))
+            
+            if not admission.enter():
+                raise ServiceUnavailable('The server is busy, please retry shortly.',
+                                         retry_after=math.ceil(admission.queue_timeout))
+            try:
+                return f(*args, **kwargs)
+            finally:
+                admission.leave()
+        return decorated_function
+    return decorator
+
+@app.errorhandler(TooManyRequests)
+@app.errorhandler(ServiceUnavailable)
+def admission_rejected(e):
+    # Machine clients of the JSON API get a parseable body; pages keep the HTML error
+    if not request.path.startswith('/api/'):
+        return e
+    response = jsonify({'error': e.description})
+    response.status_code = e.code
+    response.headers.update(e.get_headers())
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+# Read/Write Connection Routing
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """WAL lets readers keep their snapshot while the writer commits"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        try:
+            dbapi_connection.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.OperationalError:
+            pass  # Read-only connection; the journal mode is stored in the file anyway
+
+class ReadPool:
+    """Engine and per-request sessions for the read-only connection pool.
+
+    Uses READ_DATABASE_URI (a replica) when set. Otherwise the primary SQLite
+    file is opened read-only and each request reads inside one transaction, so
+    a page sees a single WAL snapshot. Writes stay on db.session and its small
+    writer pool.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._engine = None
+        self._lock = threading.Lock()
+        self.Session = sessionmaker()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._create_engine()
+        return self._engine
+
+    def _create_engine(self):
+        options = {'pool_size': self.app.config['READ_POOL_SIZE'], 'max_overflow': 0}
+        if self.app.config['READ_DATABASE_URI']:
+            return create_engine(self.app.config['READ_DATABASE_URI'], **options)
+        
+        url = db.engine.url
+        if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+            return create_engine(url, **options)  # No replica: same database, separate pool
+        
+        engine = create_engine(f'sqlite:///file:{url.database}?mode=ro&uri=true', **options)
+        
+        @event.listens_for(engine, 'connect')
+        def _manual_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None  # pysqlite would otherwise skip BEGIN for SELECTs
+        
+        @event.listens_for(engine, 'begin')
+        def _begin_snapshot(conn):
+            conn.exec_driver_sql('BEGIN')
+        
+        return engine
+
+    def session(self):
+        """The request's read session, opened on first use"""
+        if 'read_session' not in g:
+            g.read_session = self.Session(bind=self.engine)
+        return g.read_session
+
+read_pool = ReadPool(app)
+
+def read_db():
+    """Session for read queries: the read pool inside read_only_route views, db.session elsewhere"""
+    if has_request_context() and g.get('use_read_pool'):
+        return read_pool.session()
+    return db.session
+
+def read_only_route(read_your_writes=False):
+    """Decorator serving a view's queries from the read pool.
+
+    With read_your_writes, a caller who committed within READ_YOUR_WRITES_SECONDS
+    reads from the writer instead, so replica lag never hides their own booking.
+    """
+    from functools import wraps
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Only views that need it read the session: touching it adds Vary: Cookie
+            last_write = session.get('last_write_at') if read_your_writes else None
+            g.use_read_pool = not (
+                last_write and time.time() - last_write < app.config['READ_YOUR_WRITES_SECONDS']
+            )
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+@event.listens_for(db.session, 'after_commit')
+def _note_request_write(session):
+    if has_request_context():
+        g.wrote = True
+
+@app.after_request
+def remember_last_write(response):
+    if g.get('wrote'):
+        session['last_write_at'] = time.time()
+    return response
+
+@app.teardown_appcontext
+def close_read_session(exc):
+    read_session = g.pop('read_session', None)
+    if read_session is not None:
+        read_session.close()
+
+# Booking Event Log
+class EventLog:
+    """Append-only log of bookings, releases, holds and lot changes, plus state snapshots.
+
+    Events are captured from the ORM at flush time and inserted as one batch on
+    the same transaction, so the log commits or rolls back with the state it
+    describes. Every EVENT_SNAPSHOT_INTERVAL events the lots, spots, reservations
+    and holds are snapshotted; replay() rebuilds them from the newest snapshot
+    plus the events after it. /api/events serves the log as a change feed.
+    """
+
+    tables = OrderedDict([
+        ('lots', (ParkingLot, ('prime_location_name', 'price', 'address', 'pin_code',
+                               'maximum_number_of_spots', 'version', 'peak_price', 'peak_start_hour',
+                               'peak_end_hour', 'weekend_price', 'daily_cap'))),
+        ('spots', (ParkingSpot, ('lot_id', 'spot_number', 'status'))),
+        ('reservations', (ReserveParkingSpot, ('spot_id', 'user_id', 'parking_timestamp', 'leaving_timestamp',
+                                               'parking_cost_per_hour', 'total_cost', 'is_active',
+                                               'expires_at', 'overstayed', 'tariff'))),
+        ('holds', (AdvanceReservation, ('spot_id', 'user_id', 'start_time', 'end_time',
+                                        'parking_cost_per_hour', 'is_active')))
+    ])
+    columns = ('kind', 'lot_id', 'spot_id', 'reservation_id', 'user_id', 'at', 'until', 'amount', 'data')
+
+    def __init__(self, app, snapshot_interval, snapshots_keep):
+        self.app = app
+        self.snapshot_interval = snapshot_interval
+        self.snapshots_keep = snapshots_keep
+        self._since_snapshot = 0
+        self._snapshotting = threading.Lock()
+
+    @staticmethod
+    def _changed(obj, attr):
+        return inspect(obj).attrs[attr].history.has_changes()
+
+    def _event(self, kind, **fields):
+        return dict(dict.fromkeys(self.columns), kind=kind, **fields)
+
+    def _lot_event(self, kind, lot):
+        fields = self.tables['lots'][1]
+        return self._event(kind, lot_id=lot.id, data=json.dumps({f: getattr(lot, f) for f in fields}))
+
+    def _booked(self, reservation):
+        return self._event('book', spot_id=reservation.spot_id, reservation_id=reservation.id,
+                           user_id=reservation.user_id, at=reservation.parking_timestamp,
+                           until=reservation.expires_at, amount=reservation.parking_cost_per_hour,
+                           data=reservation.tariff)
+
+    def _released(self, reservation):
+        return self._event('release', spot_id=reservation.spot_id, reservation_id=reservation.id,
+                           user_id=reservation.user_id, at=reservation.leaving_timestamp,
+                           amount=reservation.total_cost)
+
+    def collect(self, session):
+        """Event rows for what a flush just wrote, in replay order"""
+        lots_added, spots_added, releases, bookings, other, spots_removed, lots_removed = [], [], [], [], [], [], []
+        explained = session.info.setdefault('explained_spots', set())  # Status set by a booking or release
+
+        for obj in session.new:
+            if isinstance(obj, ParkingLot):
+                lots_added.append(self._lot_event('lot_add', obj))
+            elif isinstance(obj, ParkingSpot):
+                spots_added.append(self._event('spot_add', lot_id=obj.lot_id, spot_id=obj.id,
+                                               data=json.dumps([obj.spot_number, obj.status or 'A'])))
+            elif isinstance(obj, ReserveParkingSpot):
+                bookings.append(self._booked(obj))
+                if obj.is_active is False:
+                    bookings.append(self._released(obj))
+                explained.add(obj.spot_id)
+            elif isinstance(obj, AdvanceReservation):
+                bookings.append(self._event('hold', spot_id=obj.spot_id, reservation_id=obj.id, user_id=obj.user_id,
+                                            at=obj.start_time, until=obj.end_time, amount=obj.parking_cost_per_hour))
+
+        for obj in session.dirty:
+            if isinstance(obj, ReserveParkingSpot):
+                if self._changed(obj, 'is_active') and not obj.is_active:
+                    releases.append(self._released(obj))
+                    explained.add(obj.spot_id)
+                if self._changed(obj, 'overstayed') and obj.overstayed:
+                    other.append(self._event('overstay', spot_id=obj.spot_id, reservation_id=obj.id,
+                                             user_id=obj.user_id))
+            elif isinstance(obj, AdvanceReservation):
+                if self._changed(obj, 'is_active') and not obj.is_active:
+                    releases.append(self._event('hold_end', spot_id=obj.spot_id, reservation_id=obj.id,
+                                                user_id=obj.user_id))
+            elif isinstance(obj, ParkingLot):
+                if any(self._changed(obj, f) for f in self.tables['lots'][1]):
+                    other.append(self._lot_event('lot_update', obj))
+
+        for obj in session.dirty:
+            if isinstance(obj, ParkingSpot) and obj.id not in explained and self._changed(obj, 'status'):
+                other.append(self._event('spot_status', lot_id=obj.lot_id, spot_id=obj.id,
+                                         data=json.dumps(obj.status)))
+
+        for obj in session.deleted:
+            if isinstance(obj, ParkingSpot):
+                spots_removed.append(self._event('spot_remove', lot_id=obj.lot_id, spot_id=obj.id))
+            elif isinstance(obj, ParkingLot):
+                lots_removed.append(self._event('lot_remove', lot_id=obj.id))
+
+        return lots_added + spots_added + releases + bookings + other + spots_removed + lots_removed
+
+    def append(self, session):
+        """Insert a flush's events on the session's transaction"""
+        rows = self.collect(session)
+        if rows:
+            now = datetime.utcnow()
+            for row in rows:
+                row['created_at'] = now
+            session.connection().execute(BookingEvent.__table__.insert(), rows)
+            session.info.setdefault('logged_events', []).extend(rows)
+
+    def ensure_baseline(self):
+        """Snapshot the existing state once, so replay has a starting point"""
+        if StateSnapshot.query.first() is None:
+            self.snapshot()
+
+    def committed(self, count):
+        """Count committed events and start a background snapshot once the interval is reached"""
+        self._since_snapshot += count
+        if self._since_snapshot >= self.snapshot_interval and not self._snapshotting.locked():
+            self._since_snapshot = 0
+            threading.Thread(target=self.snapshot, kwargs={'min_gap': self.snapshot_interval},
+                             name='event-snapshot', daemon=True).start()
+
+    @staticmethod
+    def _rows(conn, sql):
+        """Plain DB-API tuples; Row objects cost more than the replay itself at a year of events"""
+        if not conn.in_transaction():
+            conn.begin()
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(sql)
+            while True:
+                batch = cursor.fetchmany(10_000)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            cursor.close()
+
+    def load_state(self, conn):
+        """{table: {id: [fields]}} for lots, spots, reservations and holds"""
+        state = {}
+        for name, (model, fields) in self.tables.items():
+            rows = self._rows(conn, f"SELECT id, {', '.join(fields)} FROM {model.__tablename__}")
+            state[name] = {row[0]: list(row[1:]) for row in rows}
+        return state
+
+    def snapshot(self, min_gap=0):
+        """Store the current state with the last event it includes; returns that event id"""
+        with self._snapshotting, self.app.app_context():
+            with read_pool.engine.connect() as conn:  # One read transaction, so state and event id agree
+                event_id = conn.execute(text('SELECT MAX(id) FROM booking_event')).scalar() or 0
+                latest = conn.execute(text('SELECT MAX(event_id) FROM state_snapshot')).scalar()
+                if latest is not None and event_id - latest < max(min_gap, 1):
+                    return latest  # Nothing new, or another worker just took one
+                state = self.load_state(conn)
+
+            payload = {name: {'ids': list(rows), 'rows': list(rows.values())} for name, rows in state.items()}
+            db.session.add(StateSnapshot(event_id=event_id, data=gzip.compress(json.dumps(
+                payload, separators=(',', ':'), default=str
+            ).encode(), compresslevel=6)))
+            db.session.flush()
+            stale = [snapshot_id for snapshot_id, in db.session.query(StateSnapshot.id).order_by(
+                StateSnapshot.event_id.desc()
+            ).offset(self.snapshots_keep)]
+            if stale:
+                StateSnapshot.query.filter(StateSnapshot.id.in_(stale)).delete(synchronize_session=False)
+            db.session.commit()
+            return event_id
+
+    def replay(self, from_scratch=False):
+        """(state, base event id, events applied) rebuilt from the newest snapshot plus later events"""
+        with read_pool.engine.connect() as conn:
+            snapshot = None if from_scratch else conn.execute(text(
+                'SELECT event_id, data FROM state_snapshot ORDER BY event_id DESC LIMIT 1'
+            )).first()
+            if snapshot:
+                base_id = snapshot[0]
+                payload = json.loads(gzip.decompress(snapshot[1]))
+                # Rows from snapshots taken before a field was added are padded with None
+                state = {name: {row_id: row + [None] * (len(fields) - len(row))
+                                for row_id, row in zip(payload[name]['ids'], payload[name]['rows'])}
+                         for name, (_, fields) in self.tables.items()}
+            else:
+                base_id = 0
+                state = {name: {} for name in self.tables}
+            lots, spots, reservations, holds = (state[name] for name in self.tables)
+
+            count = 0
+            events = self._rows(conn, f"SELECT {', '.join(self.columns)} FROM booking_event "
+                                      f"WHERE id > {int(base_id)} ORDER BY id")
+            for kind, lot_id, spot_id, key, user_id, at, until, amount, data in events:
+                count += 1
+                if kind == 'book':
+                    reservations[key] = [spot_id, user_id, at, None, amount, None, 1, until, 0, data]
+                    spot = spots.get(spot_id)
+                    if spot:
+                        spot[2] = 'O'
+                elif kind == 'release':
+                    reservation = reservations.get(key)
+                    if reservation:
+                        reservation[3], reservation[5], reservation[6] = at, amount, 0
+                    spot = spots.get(spot_id)
+                    if spot:
+                        spot[2] = 'A'
+                elif kind == 'hold':
+                    holds[key] = [spot_id, user_id, at, until, amount, 1]
+                elif kind == 'hold_end':
+                    if key in holds:
+                        holds[key][5] = 0
+                elif kind == 'overstay':
+                    if key in reservations:
+                        reservations[key][8] = 1
+                elif kind == 'spot_status':
+                    if spot_id in spots:
+                        spots[spot_id][2] = json.loads(data)
+                elif kind == 'spot_add':
+                    spot_number, status = json.loads(data)
+                    spots[spot_id] = [lot_id, spot_number, status]
+                elif kind == 'spot_remove':
+                    spots.pop(spot_id, None)
+                elif kind in ('lot_add', 'lot_update'):
+                    values = json.loads(data)
+                    lots[lot_id] = [values[f] for f in self.tables['lots'][1]]
+                elif kind == 'lot_remove':
+                    lots.pop(lot_id, None)
+                    for orphan in [spot for spot, row in spots.items() if row[0] == lot_id]:
+                        del spots[orphan]
+        return state, base_id, count
+
+    def diff(self, state):
+        """{table: (ids missing from the DB, ids that differ, ids not in the log)}"""
+        with read_pool.engine.connect() as conn:
+            current = self.load_state(conn)
+        result = {}
+        for name, rows in state.items():
+            actual = current[name]
+            result[name] = (
+                [row_id for row_id in rows if row_id not in actual],
+                [row_id for row_id, row in rows.items() if row_id in actual and list(row) != actual[row_id]],
+                [row_id for row_id in actual if row_id not in rows]
+            )
+        return result
+
+    def apply(self, state, differences):
+        """Write rebuilt rows over the DB where they differ"""
+        with db.engine.begin() as conn:
+            for name, (missing, differing, extra) in differences.items():
+                model, fields = self.tables[name]
+                table = model.__tablename__
+                params = lambda ids: [dict(zip(('id',) + fields, [row_id] + list(state[name][row_id]))) for row_id in ids]
+                if missing:
+                    conn.execute(text(f"INSERT INTO {table} (id, {', '.join(fields)}) "
+                                      f"VALUES (:id, {', '.join(':' + f for f in fields)})"), params(missing))
+                if differing:
+                    conn.execute(text(f"UPDATE {table} SET {', '.join(f'{f} = :{f}' for f in fields)} "
+                                      f"WHERE id = :id"), params(differing))
+                if extra:
+                    conn.execute(text(f'DELETE FROM {table} WHERE id = :id'), [{'id': row_id} for row_id in extra])
+        occupancy.rebuild()
+
+event_log = EventLog(app, app.config['EVENT_SNAPSHOT_INTERVAL'], app.config['EVENT_SNAPSHOTS_KEEP'])
+
+@event.listens_for(db.session, 'after_flush')
+def _log_booking_events(session, flush_context):
+    event_log.append(session)
+
+@event.listens_for(db.session, 'after_commit')
+def _count_logged_events(session):
+    session.info.pop('explained_spots', None)
+    rows = session.info.pop('logged_events', None)
+    if rows:
+        event_log.committed(len(rows))
+        audit_booking_events(rows)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_logged_events(session):
+    session.info.pop('explained_spots', None)
+    session.info.pop('logged_events', None)
+
+@app.cli.command('snapshot-state')
+def snapshot_state_command():
+    """Snapshot lots, spots, reservations and holds at the current end of the event log"""
+    print(f' Snapshot taken at event {event_log.snapshot()}.')
+
+@app.cli.command('replay-events')
+@click.option('--apply', 'apply_changes', is_flag=True, help='Write the rebuilt state over the database.')
+@click.option('--from-scratch', is_flag=True, help='Ignore snapshots and replay the whole log.')
+def replay_events_command(apply_changes, from_scratch):
+    """Rebuild spot and reservation state from the newest snapshot plus the event log"""
+    started = time.perf_counter()
+    state, base_id, count = event_log.replay(from_scratch)
+    print(f' Replayed {count} events after event {base_id} in {time.perf_counter() - started:.2f}s: '
+          + ', '.join(f'{len(rows)} {name}' for name, rows in state.items()))
+
+    differences = event_log.diff(state)
+    for name, (missing, differing, extra) in differences.items():
+        if missing or differing or extra:
+            print(f' {name}: {len(missing)} missing, {len(differing)} differ, {len(extra)} not in the log '
+                  f'(e.g. ids {(missing + differing + extra)[:10]})')
+    if not any(any(ids) for ids in differences.values()):
+        print(' Database matches the event log.')
+    elif apply_changes:
+        event_log.apply(state, differences)
+        print(' Database rewritten from the event log; restart the app workers to reload their indexes.')
+
+# Bulk User Import
+import_candidates = Table(
+    'import_candidate', MetaData(),
+    Column('username', String(80)),
+    Column('email', String(120)),
+    prefixes=['TEMPORARY']
+)
+
+def _hash_password(password, method):
+    return generate_password_hash(password, method=method)
+
+def read_user_records(data, filename=''):
+    """User dicts from CSV (with a header row) or JSON (a list, or {"users": [...]})"""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    if filename.lower().endswith('.json') or data.lstrip()[:1] in ('[', '{'):
+        records = json.loads(data)
+        if isinstance(records, dict):
+            records = records.get('users')
+        if not isinstance(records, list):
+            raise ValueError('JSON must be a list of users or {"users": [...]}')
+        return records
+    return list(csv.DictReader(io.StringIO(data)))
+
+def find_registered(candidates):
+    """(usernames, emails) among the candidates that already exist, in one set-based query"""
+    conn = db.session.connection()
+    import_candidates.create(conn, checkfirst=True)
+    conn.execute(import_candidates.delete())
+    conn.execute(import_candidates.insert(), [
+        {'username': c['username'], 'email': c['email']} for c in candidates
+    ])
+    rows = conn.execute(select(User.username, User.email).where(or_(
+        User.username.in_(select(import_candidates.c.username)),
+        User.email.in_(select(import_candidates.c.email))
+    ))).all()
+    import_candidates.drop(conn)
+    return {username for username, _ in rows}, {email for _, email in rows}
+
+_hash_pool = None
+_hash_pool_pid = None
+_hash_pool_lock = threading.Lock()
+
+def hash_pool():
+    """Process pool for password hashing, shared by every import in this process"""
+    global _hash_pool, _hash_pool_pid
+    with _hash_pool_lock:
+        if _hash_pool is None or _hash_pool_pid != os.getpid():  # A forked worker needs its own
+            _hash_pool = ProcessPoolExecutor(max_workers=app.config['IMPORT_HASH_WORKERS'])
+            _hash_pool_pid = os.getpid()
+        return _hash_pool
+
+def bulk_import_users(records, progress=None):
+    """Validate, hash and insert users in chunked transactions; returns {'created', 'skipped'}
+
+    progress, if given, is called with (created, skipped) counts after each step.
+    """
+    skipped, candidates, usernames, emails = [], [], set(), set()
+    for row_number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            skipped.append({'row': row_number, 'username': None, 'error': 'Not a user record'})
+            continue
+
+        username = str(record.get('username') or '').strip()
+        email = str(record.get('email') or '').strip()
+        phone = str(record.get('phone') or '').strip() or None
+        password = str(record.get('password') or '')
+        if not username or not email or not password:
+            error = 'Username, email and password are required'
+        elif len(username) > 80 or len(email) > 120 or (phone and len(phone) > 15):
+            error = 'Username, email or phone is too long'
+        elif username in usernames:
+            error = 'Username repeated in this file'
+        elif email in emails:
+            error = 'Email repeated in this file'
+        else:
+            usernames.add(username)
+            emails.add(email)
+            candidates.append({'row': row_number, 'username': username, 'email': email,
+                               'phone': phone, 'password': password})
+            continue
+        skipped.append({'row': row_number, 'username': username or None, 'error': error})
+
+    if candidates:
+        taken_usernames, taken_emails = find_registered(candidates)
+        db.session.commit()
+        fresh = []
+        for c in candidates:
+            if c['username'] in taken_usernames or c['email'] in taken_emails:
+                error = 'Username already exists' if c['username'] in taken_usernames else 'Email already exists'
+                skipped.append({'row': c['row'], 'username': c['username'], 'error': error})
+            else:
+                fresh.append(c)
+        candidates = fresh
+
+    created = 0
+    if progress:
+        progress(created, len(skipped))
+    if candidates:
+        chunk_size = app.config['IMPORT_USERS_CHUNK_SIZE']
+        hashes = hash_pool().map(partial(_hash_password, method=app.config['IMPORT_PASSWORD_HASH_METHOD']),
+                                 [c['password'] for c in candidates], chunksize=32)
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            for c in chunk:
+                c['password_hash'] = next(hashes)
+            created += _insert_users(chunk, skipped)
+            if progress:
+                progress(created, len(skipped))
+
+    skipped.sort(key=lambda s: s['row'])
+    return {'created': created, 'skipped': skipped}
+
+def _insert_users(chunk, skipped):
+    """Insert one chunk in its own transaction; returns how many users were created"""
+    now = datetime.utcnow()
+    rows = lambda users: [{'username': c['username'], 'email': c['email'], 'phone': c['phone'],
+                           'password_hash': c['password_hash'], 'created_at': now} for c in users]
+    try:
+        db.session.execute(User.__table__.insert(), rows(chunk))
+        db.session.commit()
+        return len(chunk)
+    except IntegrityError:
+        db.session.rollback()  # Someone registered one of these names since the check
+
+    # Insert the chunk one user at a time, so a further race only skips that user
+    created = 0
+    for c in chunk:
+        try:
+            db.session.execute(User.__table__.insert(), rows([c]))
+            db.session.commit()
+            created += 1
+        except IntegrityError:
+            db.session.rollback()
+            skipped.append({'row': c['row'], 'username': c['username'], 'error': 'Username or email already exists'})
+    return created
+
+import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-import')  # One import at a time
+
+def run_import_job(job_id, records):
+    """Import an uploaded user list in the background, recording progress on its ImportJob"""
+    with app.app_context():
+        def record(**values):
+            db.session.execute(update(ImportJob).where(ImportJob.id == job_id).values(**values))
+            db.session.commit()
+        
+        record(status='running')
+        try:
+            report = bulk_import_users(records, lambda created, skipped: record(
+                processed=created + skipped, created=created))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception('User import %s failed', job_id)
+            record(status='failed', error=str(e)[:200], finished_at=datetime.utcnow())
+        else:
+            record(status='done', processed=len(records), created=report['created'],
+                   skipped=json.dumps(report['skipped']), finished_at=datetime.utcnow())
+
+def import_job_status(job):
+    """JSON-ready progress and report of an ImportJob"""
+    return {
+        'id': job.id,
+        'status': job.status,
+        'total': job.total,
+        'processed': job.processed,
+        'created': job.created,
+        'skipped': json.loads(job.skipped) if job.skipped else [],
+        'error': job.error
+    }
+
+@app.cli.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_users_command(path):
+    """Import users from a CSV (username,email,phone,password) or JSON file"""
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        report = bulk_import_users(read_user_records(f.read(), path))
+    print(f" Imported {report['created']} users in {time.perf_counter() - started:.1f}s, "
+          f"skipped {len(report['skipped'])}.")
+    for skip in report['skipped'][:20]:
+        print(f"  row {skip['row']} ({skip['username']}): {skip['error']}")
+
+# Structured Logging
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the request thread: records past the bound are dropped and counted."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class RotatingLogFile:
+    """Append-only log file rotated once it passes max_bytes or has been open for interval seconds."""
+
+    def __init__(self, path, max_bytes, interval, backup_count):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.file = None
+        self.open()
+
+    def open(self):
+        self.file = open(self.path, 'ab')
+        stat = os.fstat(self.file.fileno())
+        self.size = stat.st_size
+        self.rollover_at = (stat.st_mtime if stat.st_size else time.time()) + self.interval
+
+    def write(self, data):
+        if self.size and (self.size + len(data) > self.max_bytes or time.time() >= self.rollover_at):
+            self.rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def rotate(self):
+        self.file.close()
+        target = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(target if suffix == 1 else f'{target}.{suffix}'):
+            suffix += 1
+        os.replace(self.path, target if suffix == 1 else f'{target}.{suffix}')
+        
+        directory, name = os.path.split(self.path)
+        backups = sorted((f for f in os.listdir(directory) if f.startswith(name + '.')),
+                         key=lambda f: os.path.getmtime(os.path.join(directory, f)))
+        for old in backups[:max(0, len(backups) - self.backup_count)]:
+            os.remove(os.path.join(directory, old))
+        self.open()
+
+    def close(self):
+        self.file.close()
+
+class StructuredLog:
+    """JSON-lines access and audit logs written in batches by a background thread.
+
+    Request threads only put records on a bounded queue; when the writer falls behind
+    new records are dropped and counted rather than slowing requests down.
+    """
+
+    files = {'parking.access': 'access', 'parking.audit': 'audit'}
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.handler = None
+        self.written = 0
+        self.batches = 0
+        self.loggers = {name: logging.getLogger(name) for name in self.files}
+        for logger in self.loggers.values():
+            logger.propagate = False
+
+    def _ensure_started(self):
+        # Checked per process, so forked workers each start their own writer
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            log_queue = queue.Queue(app.config['LOG_QUEUE_SIZE'])
+            handler = BoundedQueueHandler(log_queue)
+            for logger in self.loggers.values():
+                if self.handler is not None:
+                    logger.removeHandler(self.handler)
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+            self.handler = handler
+            threading.Thread(target=self._writer, args=(log_queue,), daemon=True,
+                             name='structured-log-writer').start()
+            self.pid = os.getpid()
+
+    def _writer(self, log_queue):
+        directory = app.config['LOG_DIR'] or os.path.join(app.instance_path, 'logs')
+        os.makedirs(directory, exist_ok=True)
+        # One file per process (e.g. access.1234.log): a worker that rotated a shared file would
+        # rename it under the others, which would keep appending to the renamed copy
+        outputs = {
+            name: RotatingLogFile(os.path.join(directory, f'{stem}.{os.getpid()}.log'), app.config['LOG_MAX_BYTES'],
+                                  app.config['LOG_ROTATE_INTERVAL'], app.config['LOG_BACKUP_COUNT'])
+            for name, stem in self.files.items()
+        }
+        batch_size = app.config['LOG_BATCH_SIZE']
+        flush_interval = app.config['LOG_FLUSH_INTERVAL']
+        
+        while True:
+            batch = [log_queue.get()]
+            deadline = time.monotonic() + flush_interval
+            while len(batch) < batch_size:
+                # Poll rather than block, so request threads never have to wake the writer
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    time.sleep(min(remaining, 0.05))
+            
+            lines = {}
+            for record in batch:
+                lines.setdefault(record.name, []).append(json.dumps(record.fields, default=str))
+            for name, entries in lines.items():
+                try:
+                    outputs[name].write(('\n'.join(entries) + '\n').encode())
+                except OSError:
+                    logging.getLogger(__name__).exception('Could not write %s', outputs[name].path)
+            self.written += len(batch)
+            self.batches += 1
+
+    def log(self, name, fields):
+        self._ensure_started()
+        # Build the record directly: Logger.info() would walk the stack for a caller we never print
+        logger = self.loggers[name]
+        if logger.isEnabledFor(logging.INFO):
+            logger.handle(logger.makeRecord(name, logging.INFO, '', 0, '', None, None,
+                                            extra={'fields': fields}))
+
+    def stats(self):
+        return {
+            'queued': self.handler.queue.qsize() if self.handler else 0,
+            'dropped': self.handler.dropped if self.handler else 0,
+            'written': self.written,
+            'batches': self.batches,
+        }
+
+structured_log = StructuredLog()
+
+@app.before_request
+def start_request_log():
+    g.request_id = request.headers.get('X-Request-ID', '')[:64] or os.urandom(8).hex()
+    g.request_started = time.perf_counter()
+    g.sql_count = 0
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_request_sql(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_count = g.get('sql_count', 0) + 1
+
+@app.after_request
+def log_access(response):
+    if 'request_id' not in g:
+        return response
+    response.headers['X-Request-ID'] = g.request_id
+    if app.config['ACCESS_LOG_ENABLED']:
+        structured_log.log('parking.access', {
+            'ts': datetime.utcnow().isoformat(),
+            'request_id': g.request_id,
+            'user_id': g.get('user_id'),  # Set by login_required; reading the session would add Vary: Cookie
+            'method': request.method,
+            'path': request.path,
+            'route': request.endpoint,
+            'status': response.status_code,
+            'latency_ms': round((time.perf_counter() - g.request_started) * 1000, 3),
+            'sql_count': g.sql_count,
+            'remote_addr': request.remote_addr,
+        })
+    return response
+
+def audit_booking_events(rows):
+    """Write an audit record for each committed booking event"""
+    if not app.config['AUDIT_LOG_ENABLED']:
+        return
+    in_request = has_request_context()
+    context = {
+        'request_id': g.get('request_id') if in_request else None,
+        'actor_id': g.get('user_id') if in_request else None,
+        'route': request.endpoint if in_request else None,
+    }
+    for row in rows:
+        structured_log.log('parking.audit', {
+            'ts': row['created_at'].isoformat(),
+            **context,
+            'action': row['kind'],
+            'lot_id': row['lot_id'],
+            'spot_id': row['spot_id'],
+            'reservation_id': row['reservation_id'],
+            'user_id': row['user_id'],
+            'amount': row['amount'],
+            'at': row['at'].isoformat() if row['at'] else None,
+            'until': row['until'].isoformat() if row['until'] else None,
+        })
+
 # Routes
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/login', methods=['GET', 'POST'])
+@admission_controlled('login', methods=('POST',))
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -108,6 +2314,7 @@ def login():
         if user and check_password_hash(user.password_hash, password):
             session['user_id'] = user.id
             session['username'] = user.username
+            g.user_id = user.id
             
             if username == 'admin':
                 return redirect(url_for('admin_dashboard'))
@@ -119,6 +2326,7 @@ def login():
     return render_template('login.html')
 
 @app.route('/register', methods=['GET', 'POST'])
+@admission_controlled('login', methods=('POST',))
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -158,16 +2366,23 @@ def logout():
 @app.route('/admin/dashboard')
 @login_required
 @admin_required
+@read_only_route()
 def admin_dashboard():
-    parking_lots = ParkingLot.query.all()
+    parking_lots = read_db().query(
+        ParkingLot.id, ParkingLot.version, ParkingLot.maximum_number_of_spots
+    ).order_by(ParkingLot.id).all()
+    availability = available_spot_counts(lot_id for lot_id, _, _ in parking_lots)
+    lot_rows = fragment_cache.render_lots(
+        'lot_row.html', [(lot_id, version) for lot_id, version, _ in parking_lots], availability
+    )
     total_lots = len(parking_lots)
-    total_spots = sum(lot.maximum_number_of_spots for lot in parking_lots)
-    occupied_spots = ParkingSpot.query.filter_by(status='O').count()
+    total_spots = sum(max_spots for _, _, max_spots in parking_lots)
+    occupied_spots = sum(occupied for _, occupied in availability.values())
     available_spots = total_spots - occupied_spots
-    total_users = User.query.filter(User.username != 'admin').count()
+    total_users = read_db().query(User).filter(User.username != 'admin').count()
     
     return render_template('admin_dashboard.html', 
-                         parking_lots=parking_lots,
+                         lot_rows=lot_rows,
                          total_lots=total_lots,
                          total_spots=total_spots,
                          occupied_spots=occupied_spots,
@@ -179,12 +2394,19 @@ def admin_dashboard():
 @admin_required
 def create_parking_lot():
     if request.method == 'POST':
+        try:
+            tariff = tariff_form_fields(request.form)
+        except ValueError as e:
+            flash(f'Invalid tariff: {e}', 'error')
+            return render_template('create_lot.html')
+        
         lot = ParkingLot(
             prime_location_name=request.form['location_name'],
             price=float(request.form['price']),
             address=request.form['address'],
             pin_code=request.form['pin_code'],
-            maximum_number_of_spots=int(request.form['max_spots'])
+            maximum_number_of_spots=int(request.form['max_spots']),
+            **tariff
         )
         
         db.session.add(lot)
@@ -200,6 +2422,8 @@ def create_parking_lot():
             db.session.add(spot)
         
         db.session.commit()
+        for spot in lot.spots:
+            spot_index.add_spot(lot.id, spot.id)
         flash('Parking lot created successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
     
@@ -212,13 +2436,22 @@ def edit_parking_lot(lot_id):
     lot = ParkingLot.query.get_or_404(lot_id)
     
     if request.method == 'POST':
+        try:
+            tariff = tariff_form_fields(request.form)
+        except ValueError as e:
+            flash(f'Invalid tariff: {e}', 'error')
+            return render_template('edit_lot.html', lot=lot)
+        
         lot.prime_location_name = request.form['location_name']
         lot.price = float(request.form['price'])
         lot.address = request.form['address']
         lot.pin_code = request.form['pin_code']
+        for field, value in tariff.items():
+            setattr(lot, field, value)
         new_max_spots = int(request.form['max_spots'])
         
         current_spots = len(lot.spots)
+        added_spots, removed_spot_ids = [], []
         
         if new_max_spots > current_spots:
             # Add new spots
@@ -229,14 +2462,29 @@ def edit_parking_lot(lot_id):
                     status='A'
                 )
                 db.session.add(spot)
+                added_spots.append(spot)
         elif new_max_spots < current_spots:
-            # Remove excess spots (only if they're available)
-            spots_to_remove = ParkingSpot.query.filter_by(lot_id=lot.id, status='A').limit(current_spots - new_max_spots).all()
+            # Remove excess spots (only if they're available and not reserved ahead)
+            held_spot_ids = db.session.query(AdvanceReservation.spot_id).filter(
+                AdvanceReservation.is_active == True,
+                AdvanceReservation.end_time > datetime.utcnow()
+            )
+            spots_to_remove = ParkingSpot.query.filter(
+                ParkingSpot.lot_id == lot.id,
+                ParkingSpot.status == 'A',
+                ~ParkingSpot.id.in_(held_spot_ids)
+            ).limit(current_spots - new_max_spots).all()
             for spot in spots_to_remove:
+                removed_spot_ids.append(spot.id)
                 db.session.delete(spot)
         
         lot.maximum_number_of_spots = new_max_spots
+        lot.version = (lot.version or 1) + 1
         db.session.commit()
+        for spot in added_spots:
+            spot_index.add_spot(lot.id, spot.id)
+        for spot_id in removed_spot_ids:
+            spot_index.drop_spot(lot.id, spot_id)
         flash('Parking lot updated successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
     
@@ -254,21 +2502,35 @@ def delete_parking_lot(lot_id):
         flash('Cannot delete parking lot with occupied spots!', 'error')
         return redirect(url_for('admin_dashboard'))
     
+    upcoming_holds = AdvanceReservation.query.join(ParkingSpot).filter(
+        ParkingSpot.lot_id == lot.id,
+        AdvanceReservation.is_active == True,
+        AdvanceReservation.end_time > datetime.utcnow()
+    ).count()
+    if upcoming_holds > 0:
+        flash('Cannot delete parking lot with upcoming advance reservations!', 'error')
+        return redirect(url_for('admin_dashboard'))
+    
     db.session.delete(lot)
     db.session.commit()
+    spot_index.drop_lot(lot_id)
+    fragment_cache.discard_lot(lot_id)
     flash('Parking lot deleted successfully!', 'success')
     return redirect(url_for('admin_dashboard'))
 
 @app.route('/admin/view_spots/<int:lot_id>')
 @login_required
 @admin_required
+@read_only_route()
 def view_spots(lot_id):
-    lot = ParkingLot.query.get_or_404(lot_id)
-    spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
+    lot = read_db().get(ParkingLot, lot_id)
+    if lot is None:
+        abort(404)
+    spots = read_db().query(ParkingSpot).filter_by(lot_id=lot.id).all()
     
     spot_details = []
     for spot in spots:
-        active_reservation = ReserveParkingSpot.query.filter_by(
+        active_reservation = read_db().query(ReserveParkingSpot).filter_by(
             spot_id=spot.id, is_active=True
         ).first()
         
@@ -284,125 +2546,813 @@ def view_spots(lot_id):
 @app.route('/admin/users')
 @login_required
 @admin_required
+@read_only_route()
 def view_users():
-    users = User.query.filter(User.username != 'admin').all()
+    users = read_db().query(User).filter(User.username != 'admin').all()
     return render_template('view_users.html', users=users)
 
+@app.route('/admin/import_users', methods=['GET', 'POST'])
+@login_required
+@admin_required
+@admission_controlled('import', methods=('POST',))
+def import_users():
+    if request.method == 'GET':
+        job = db.session.get(ImportJob, request.args.get('job', type=int) or 0)
+        return render_template('import_users.html', job=import_job_status(job) if job else None)
+    
+    # Enforced as the body is read, so chunked uploads without a Content-Length are limited too
+    request.max_content_length = app.config['IMPORT_USERS_MAX_BYTES']
+    try:
+        if request.is_json:
+            data = request.get_data()
+            # A chunked body is cut off at the limit rather than rejected, so look for a byte beyond it
+            if (len(data) >= request.max_content_length and request.content_length is None
+                    and request.environ['wsgi.input'].read(1)):
+                raise RequestEntityTooLarge()
+            records = read_user_records(data, 'users.json')
+        else:
+            upload = request.files.get('file')
+            if not upload or not upload.filename:
+                raise ValueError('Choose a CSV or JSON file to import')
+            records = read_user_records(upload.read(), upload.filename)
+    except RequestEntityTooLarge:
+        error = f"Uploads are limited to {app.config['IMPORT_USERS_MAX_BYTES'] // (1024 * 1024)} MB"
+        if request.is_json:
+            return jsonify({'error': error}), 413
+        flash(error, 'error')
+        return render_template('import_users.html', job=None)
+    except (ValueError, csv.Error) as e:
+        if request.is_json:
+            return jsonify({'error': str(e)}), 400
+        flash(f'Could not read the user list: {e}', 'error')
+        return render_template('import_users.html', job=None)
+    
+    job = ImportJob(total=len(records))
+    db.session.add(job)
+    db.session.commit()
+    import_executor.submit(run_import_job, job.id, records)
+    if request.is_json:
+        return jsonify({'job_id': job.id, 'status_url': url_for('import_job', job_id=job.id)}), 202
+    return redirect(url_for('import_users', job=job.id))
+
+@app.route('/admin/import_jobs/<int:job_id>')
+@login_required
+@admin_required
+def import_job(job_id):
+    job = db.session.get(ImportJob, job_id)
+    if not job:
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(import_job_status(job))
+
 @app.route('/user/dashboard')
 @login_required
+@read_only_route(read_your_writes=True)
 def user_dashboard():
     if is_admin():
         return redirect(url_for('admin_dashboard'))
     
     user_id = session['user_id']
-    active_reservations = ReserveParkingSpot.query.filter_by(user_id=user_id, is_active=True).all()
-    past_reservations = ReserveParkingSpot.query.filter_by(user_id=user_id, is_active=False).limit(10).all()
+    active_reservations = read_db().query(ReserveParkingSpot).filter_by(user_id=user_id, is_active=True).all()
+    past_reservations = read_db().query(ReserveParkingSpot).filter_by(user_id=user_id, is_active=False).limit(10).all()
+    advance_reservations = read_db().query(AdvanceReservation).filter(
+        AdvanceReservation.user_id == user_id,
+        AdvanceReservation.is_active == True,
+        AdvanceReservation.end_time > datetime.utcnow()
+    ).order_by(AdvanceReservation.start_time).all()
     
-    parking_lots = ParkingLot.query.all()
+    # Lot cards are the same for every user, so they come from the fragment cache
+    parking_lots = read_db().query(ParkingLot.id, ParkingLot.version).order_by(ParkingLot.id).all()
+    availability = available_spot_counts(lot_id for lot_id, _ in parking_lots)
+    lot_cards = fragment_cache.render_lots('lot_card.html', parking_lots, availability)
     
     return render_template('user_dashboard.html', 
                          active_reservations=active_reservations,
                          past_reservations=past_reservations,
-                         parking_lots=parking_lots)
+                         advance_reservations=advance_reservations,
+                         lot_cards=lot_cards)
 
 @app.route('/user/book_spot/<int:lot_id>')
 @login_required
+@admission_controlled('booking')
 def book_spot(lot_id):
     if is_admin():
         flash('Admin cannot book spots', 'error')
         return redirect(url_for('admin_dashboard'))
     
-    lot = ParkingLot.query.get_or_404(lot_id)
-    available_spot = ParkingSpot.query.filter_by(lot_id=lot.id, status='A').first()
-    
-    if not available_spot:
-        flash('No available spots in this parking lot!', 'error')
+    hours = request.args.get('hours', type=float)
+    if hours is not None and not (0 < hours <= app.config['BOOKING_MAX_HOURS']):  # Also rejects nan
+        flash(f"Booking duration must be between 0 and {app.config['BOOKING_MAX_HOURS']} hours!", 'error')
+        return redirect(url_for('user_dashboard'))
+    
+    lot = ParkingLot.query.get_or_404(lot_id)
+    parking_time = datetime.utcnow()
+    expires_at = parking_time + timedelta(hours=hours) if hours else None
+    
+    lock_lot(lot.id)
+    with spot_index.lock:
+        available_spot, expires_at = find_spot_for_stay(lot.id, parking_time, expires_at)
+        
+        if not available_spot:
+            db.session.rollback()
+            flash('No available spots in this parking lot!', 'error')
+            return redirect(url_for('user_dashboard'))
+        
+        # Create reservation
+        reservation = ReserveParkingSpot(
+            spot_id=available_spot.id,
+            user_id=session['user_id'],
+            parking_timestamp=parking_time,
+            parking_cost_per_hour=lot.price,
+            tariff=json.dumps(lot_tariff(lot)),
+            expires_at=expires_at,
+            is_active=True
+        )
+        
+        # Update spot status
+        available_spot.status = 'O'
+        
+        db.session.add(reservation)
+        db.session.commit()
+        spot_index.add(reservation.id, lot.id, available_spot.id, parking_time, expires_at)
+    
+    if reservation.expires_at:
+        expiry_scheduler.schedule(reservation.id, reservation.expires_at)
+    
+    flash(f'Successfully booked spot {available_spot.spot_number}!', 'success')
+    return redirect(url_for('user_dashboard'))
+
+@app.route('/user/release_spot/<int:reservation_id>')
+@login_required
+@admission_controlled('booking')
+def release_spot(reservation_id):
+    reservation = ReserveParkingSpot.query.get_or_404(reservation_id)
+    
+    if reservation.user_id != session['user_id']:
+        flash('Unauthorized access!', 'error')
+        return redirect(url_for('user_dashboard'))
+    
+    if not reservation.is_active:
+        flash('This reservation has already been released.', 'info')
+        return redirect(url_for('user_dashboard'))
+    
+    total_cost = close_reservation(reservation, datetime.utcnow())
+    db.session.commit()
+    expiry_scheduler.cancel(reservation.id)
+    
+    flash(f'Spot released successfully! Total cost: ₹{total_cost}', 'success')
+    return redirect(url_for('user_dashboard'))
+
+@app.route('/user/reserve_ahead/<int:lot_id>', methods=['POST'])
+@login_required
+@admission_controlled('booking')
+def reserve_ahead(lot_id):
+    if is_admin():
+        flash('Admin cannot book spots', 'error')
+        return redirect(url_for('admin_dashboard'))
+    
+    try:
+        start_time = parse_timestamp(request.form['start_time'])
+        end_time = parse_timestamp(request.form['end_time'])
+    except (KeyError, ValueError):
+        flash('Invalid reservation window!', 'error')
         return redirect(url_for('user_dashboard'))
     
-    # Create reservation
-    reservation = ReserveParkingSpot(
-        spot_id=available_spot.id,
-        user_id=session['user_id'],
-        parking_cost_per_hour=lot.price,
-        is_active=True
-    )
+    now = datetime.utcnow()
+    if start_time < now or end_time <= start_time:
+        flash('Reservation window must start in the future and end after it starts!', 'error')
+        return redirect(url_for('user_dashboard'))
+    # Holds are free until check-in, so they are bounded like stays to stop one user holding every spot
+    if start_time > now + timedelta(days=app.config['ADVANCE_BOOKING_MAX_DAYS']):
+        flash(f"Reservations can start at most {app.config['ADVANCE_BOOKING_MAX_DAYS']} days ahead!", 'error')
+        return redirect(url_for('user_dashboard'))
+    if end_time - start_time > timedelta(hours=app.config['BOOKING_MAX_HOURS']):
+        flash(f"Reservation window can be at most {app.config['BOOKING_MAX_HOURS']} hours!", 'error')
+        return redirect(url_for('user_dashboard'))
     
-    # Update spot status
-    available_spot.status = 'O'
+    lot = ParkingLot.query.get_or_404(lot_id)
     
-    db.session.add(reservation)
-    db.session.commit()
+    lock_lot(lot.id)
+    with spot_index.lock:
+        spot_id = find_spot_for_hold(lot.id, start_time, end_time)
+        if spot_id is None:
+            db.session.rollback()
+            flash('No spots free in this parking lot for that window!', 'error')
+            return redirect(url_for('user_dashboard'))
+        
+        hold = AdvanceReservation(
+            spot_id=spot_id,
+            user_id=session['user_id'],
+            start_time=start_time,
+            end_time=end_time,
+            parking_cost_per_hour=lot.price,
+            is_active=True
+        )
+        db.session.add(hold)
+        db.session.commit()
+        spot_index.add(-hold.id, lot.id, spot_id, start_time, end_time)
     
-    flash(f'Successfully booked spot {available_spot.spot_number}!', 'success')
+    expiry_scheduler.schedule(-hold.id, end_time)
+    flash(f'Reserved spot {hold.spot.spot_number} from {start_time:%Y-%m-%d %H:%M} to {end_time:%Y-%m-%d %H:%M}!', 'success')
     return redirect(url_for('user_dashboard'))
 
-@app.route('/user/release_spot/<int:reservation_id>')
+@app.route('/user/cancel_advance/<int:advance_id>')
 @login_required
-def release_spot(reservation_id):
-    reservation = ReserveParkingSpot.query.get_or_404(reservation_id)
+def cancel_advance(advance_id):
+    hold = AdvanceReservation.query.get_or_404(advance_id)
     
-    if reservation.user_id != session['user_id']:
+    if hold.user_id != session['user_id']:
         flash('Unauthorized access!', 'error')
         return redirect(url_for('user_dashboard'))
     
-    # Calculate total cost
-    leaving_time = datetime.utcnow()
-    parking_duration = leaving_time - reservation.parking_timestamp
-    hours = max(1, parking_duration.total_seconds() / 3600)  # Minimum 1 hour
-    total_cost = round(hours * reservation.parking_cost_per_hour, 2)
+    if hold.is_active:
+        hold.is_active = False
+        db.session.commit()
+        spot_index.remove(-hold.id)
+        expiry_scheduler.cancel(-hold.id)
     
-    # Update reservation
-    reservation.leaving_timestamp = leaving_time
-    reservation.total_cost = total_cost
-    reservation.is_active = False
+    flash('Advance reservation cancelled.', 'info')
+    return redirect(url_for('user_dashboard'))
+
+@app.route('/user/check_in/<int:advance_id>')
+@login_required
+@admission_controlled('booking')
+def check_in(advance_id):
+    hold = AdvanceReservation.query.get_or_404(advance_id)
     
-    # Update spot status
-    reservation.spot.status = 'A'
+    if hold.user_id != session['user_id'] or not hold.is_active:
+        flash('Unauthorized access!', 'error')
+        return redirect(url_for('user_dashboard'))
     
-    db.session.commit()
+    now = datetime.utcnow()
+    if not hold.start_time <= now < hold.end_time:
+        flash('You can only check in during your reserved window.', 'error')
+        return redirect(url_for('user_dashboard'))
     
-    flash(f'Spot released successfully! Total cost: ₹{total_cost}', 'success')
+    # Re-read under the lot's write lock, in case another worker checked this hold in
+    lock_lot(hold.spot.lot_id)
+    with spot_index.lock:
+        db.session.refresh(hold)
+        db.session.refresh(hold.spot)
+        if not hold.is_active:
+            db.session.rollback()
+            flash('This reservation has already been checked in or cancelled.', 'info')
+            return redirect(url_for('user_dashboard'))
+        if hold.spot.status != 'A':
+            db.session.rollback()
+            flash(f'Spot {hold.spot.spot_number} is still occupied, please contact the attendant.', 'error')
+            return redirect(url_for('user_dashboard'))
+        
+        reservation = ReserveParkingSpot(
+            spot_id=hold.spot_id,
+            user_id=hold.user_id,
+            parking_timestamp=now,
+            parking_cost_per_hour=hold.parking_cost_per_hour,
+            tariff=json.dumps(lot_tariff(hold.spot.lot, hold.parking_cost_per_hour)),
+            expires_at=hold.end_time,
+            is_active=True
+        )
+        hold.is_active = False
+        hold.spot.status = 'O'
+        db.session.add(reservation)
+        db.session.commit()
+        spot_index.remove(-hold.id)
+        spot_index.add(reservation.id, hold.spot.lot_id, hold.spot_id, now, hold.end_time)
+    
+    expiry_scheduler.cancel(-hold.id)
+    expiry_scheduler.schedule(reservation.id, reservation.expires_at)
+    flash(f'Checked in to spot {hold.spot.spot_number}!', 'success')
     return redirect(url_for('user_dashboard'))
 
+@app.route('/admin/cache_stats')
+@login_required
+@admin_required
+def cache_stats():
+    return jsonify({'fragment_cache': fragment_cache.stats()})
+
+@app.route('/admin/admission_stats')
+@login_required
+@admin_required
+def admission_stats():
+    return jsonify({'admission': admission.stats()})
+
+@app.route('/admin/log_stats')
+@login_required
+@admin_required
+def log_stats():
+    return jsonify({'logging': structured_log.stats()})
+
+# Fast JSON Encoding
+if orjson:
+    def dumps_json(obj):
+        """Compact JSON bytes for plain dicts/lists/scalars"""
+        return orjson.dumps(obj)
+else:
+    _json_encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def dumps_json(obj):
+        """Compact JSON bytes for plain dicts/lists/scalars"""
+        return _json_encoder.encode(obj).encode()
+
+def json_response(obj, status=200):
+    """Like jsonify, without the provider lookup and key sorting"""
+    return app.response_class(dumps_json(obj), status=status, mimetype='application/json')
+
+def stream_json_array(items):
+    """Response that encodes items API_STREAM_CHUNK_SIZE at a time as they are sent, gzipped if accepted"""
+    chunk_size = app.config['API_STREAM_CHUNK_SIZE']
+    
+    def chunks():
+        yield b'['
+        separator = b''
+        iterator = iter(items)
+        while chunk := list(islice(iterator, chunk_size)):
+            yield separator + dumps_json(chunk)[1:-1]
+            separator = b','
+        yield b']'
+    
+    def gzipped(body):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        for data in body:
+            data = compressor.compress(data)
+            if data:
+                yield data
+        yield compressor.flush()
+    
+    # compress_response skips streamed bodies, so compress here
+    if request.accept_encodings['gzip']:
+        response = app.response_class(gzipped(chunks()), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = app.response_class(chunks(), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    return response
+
 # API Routes (Optional functionality)
 @app.route('/api/parking_lots')
+@read_only_route()
 def api_parking_lots():
-    lots = ParkingLot.query.all()
-    return jsonify([{
-        'id': lot.id,
-        'name': lot.prime_location_name,
-        'price': lot.price,
-        'address': lot.address,
-        'pin_code': lot.pin_code,
-        'total_spots': lot.maximum_number_of_spots,
-        'available_spots': len([s for s in lot.spots if s.status == 'A'])
-    } for lot in lots])
+    # Plain column rows through the session's connection; no ORM identity map or loading
+    rows = read_db().connection().execute(select(
+        ParkingLot.id, ParkingLot.prime_location_name, ParkingLot.price, ParkingLot.address,
+        ParkingLot.pin_code, ParkingLot.maximum_number_of_spots
+    ).order_by(ParkingLot.id)).all()
+    availability = available_spot_counts(row[0] for row in rows)
+    lots = ({
+        'id': lot_id,
+        'name': name,
+        'price': price,
+        'address': address,
+        'pin_code': pin_code,
+        'total_spots': total_spots,
+        'available_spots': availability[lot_id][0]
+    } for lot_id, name, price, address, pin_code, total_spots in rows)
+    
+    if len(rows) >= app.config['API_STREAM_MIN_ITEMS']:
+        return stream_json_array(lots)
+    return json_response(list(lots))
 
 @app.route('/api/search_spot')
+@read_only_route()
 def api_search_spot():
     spot_number = request.args.get('spot_number')
     if not spot_number:
         return jsonify({'error': 'Spot number required'}), 400
     
-    spot = ParkingSpot.query.filter_by(spot_number=spot_number).first()
-    if not spot:
+    # Spot, lot name and any active reservation's user in one round trip
+    row = read_db().connection().execute(
+        select(ParkingSpot.status, ParkingLot.prime_location_name, User.username,
+               ReserveParkingSpot.parking_timestamp)
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .outerjoin(ReserveParkingSpot, (ReserveParkingSpot.spot_id == ParkingSpot.id)
+                   & (ReserveParkingSpot.is_active == True))
+        .outerjoin(User, User.id == ReserveParkingSpot.user_id)
+        .where(ParkingSpot.spot_number == spot_number)
+        .order_by(ParkingSpot.id, ReserveParkingSpot.id)
+        .limit(1)
+    ).first()
+    if not row:
         return jsonify({'error': 'Spot not found'}), 404
     
+    status, lot_name, username, parked_since = row
     result = {
-        'spot_number': spot.spot_number,
-        'status': 'Available' if spot.status == 'A' else 'Occupied',
-        'lot_name': spot.lot.prime_location_name
+        'spot_number': spot_number,
+        'status': 'Available' if status == 'A' else 'Occupied',
+        'lot_name': lot_name
     }
     
-    if spot.status == 'O':
-        active_reservation = ReserveParkingSpot.query.filter_by(
-            spot_id=spot.id, is_active=True
-        ).first()
-        if active_reservation:
-            result['user'] = active_reservation.user.username
-            result['parked_since'] = active_reservation.parking_timestamp.strftime('%Y-%m-%d %H:%M:%S')
+    if status == 'O' and username is not None:
+        result['user'] = username
+        result['parked_since'] = parked_since.strftime('%Y-%m-%d %H:%M:%S')
+    
+    return json_response(result)
+
+def _is_id(value):
+    """JSON integer id; bool is an int subclass but never an id"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def run_batch_operation(op, user_id, now, after_commit):
+    """Apply one /api/batch operation to the session; returns its result dict"""
+    if not isinstance(op, dict) or op.get('op') not in ('book', 'release'):
+        return {'ok': False, 'error': 'op must be "book" or "release"'}
+    
+    if is_admin():
+        user_id = op.get('user_id')
+        if not _is_id(user_id) or not db.session.get(User, user_id):
+            return {'ok': False, 'op': op['op'], 'error': 'Valid user_id required'}
+    
+    if op['op'] == 'book':
+        lot = db.session.get(ParkingLot, op.get('lot_id')) if _is_id(op.get('lot_id')) else None
+        if not lot:
+            return {'ok': False, 'op': 'book', 'error': 'Parking lot not found'}
+        hours = op.get('hours')
+        if hours is not None and (isinstance(hours, bool) or not isinstance(hours, (int, float))
+                                  or not 0 < hours <= app.config['BOOKING_MAX_HOURS']):  # Also rejects nan/inf
+            return {'ok': False, 'op': 'book', 'error': f"hours must be between 0 and {app.config['BOOKING_MAX_HOURS']}"}
+        
+        spot, expires_at = find_spot_for_stay(lot.id, now, now + timedelta(hours=hours) if hours else None)
+        if not spot:
+            return {'ok': False, 'op': 'book', 'error': 'No available spots in this parking lot'}
+        
+        reservation = ReserveParkingSpot(
+            spot_id=spot.id,
+            user_id=user_id,
+            parking_timestamp=now,
+            parking_cost_per_hour=lot.price,
+            tariff=json.dumps(lot_tariff(lot)),
+            expires_at=expires_at,
+            is_active=True
+        )
+        spot.status = 'O'
+        db.session.add(reservation)
+        db.session.flush()  # Get the reservation.id
+        
+        after_commit.append(lambda: spot_index.add(reservation.id, lot.id, spot.id, now, expires_at))
+        if expires_at:
+            after_commit.append(lambda: expiry_scheduler.schedule(reservation.id, expires_at))
+        return {
+            'ok': True,
+            'op': 'book',
+            'reservation_id': reservation.id,
+            'lot_id': lot.id,
+            'spot_number': spot.spot_number,
+            'parking_cost_per_hour': reservation.parking_cost_per_hour,
+            'expires_at': expires_at.isoformat() if expires_at else None
+        }
+    
+    reservation_id = op.get('reservation_id')
+    reservation = db.session.get(ReserveParkingSpot, reservation_id) if _is_id(reservation_id) else None
+    if not reservation or reservation.user_id != user_id:
+        return {'ok': False, 'op': 'release', 'error': 'Reservation not found'}
+    if not reservation.is_active:
+        return {'ok': False, 'op': 'release', 'error': 'Reservation already released'}
+    
+    total_cost = close_reservation(reservation, now)
+    after_commit.append(lambda: expiry_scheduler.cancel(reservation.id))
+    return {
+        'ok': True,
+        'op': 'release',
+        'reservation_id': reservation.id,
+        'spot_number': reservation.spot.spot_number,
+        'total_cost': total_cost
+    }
+
+@app.route('/api/batch', methods=['POST'])
+@admission_controlled('booking')
+def api_batch():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Login required'}), 401
+    g.user_id = session['user_id']  # For the access and audit logs
+    
+    payload = request.get_json(silent=True)
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list):
+        return jsonify({'error': 'JSON body with an "operations" list required'}), 400
+    if len(operations) > app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'error': f"At most {app.config['BATCH_MAX_OPERATIONS']} operations per batch"}), 413
+    
+    # Replay results of operations that were already applied
+    keys = {op['idempotency_key'] for op in operations
+            if isinstance(op, dict) and isinstance(op.get('idempotency_key'), str)}
+    replayed = {}
+    if keys:
+        replayed = {record.key: json.loads(record.response) for record in IdempotencyKey.query.filter(
+            IdempotencyKey.user_id == session['user_id'],
+            IdempotencyKey.key.in_(keys)
+        )}
+    
+    # Load every reservation being released (and its spot) in one query; the
+    # list keeps them referenced so later lookups hit the identity map
+    release_ids = [op['reservation_id'] for op in operations if isinstance(op, dict)
+                   and op.get('op') == 'release' and _is_id(op.get('reservation_id'))]
+    preloaded = ReserveParkingSpot.query.options(db.joinedload(ReserveParkingSpot.spot)).filter(
+        ReserveParkingSpot.id.in_(release_ids)
+    ).all() if release_ids else []
+    
+    max_key_length = app.config['IDEMPOTENCY_KEY_MAX_LENGTH']
+    now = datetime.utcnow()
+    results, after_commit = [], []
+    committed = False
+    try:
+        # Wait for the write locks of every lot involved before taking the index lock (see lock_lot)
+        lot_ids = {op['lot_id'] for op in operations if isinstance(op, dict)
+                   and op.get('op') == 'book' and _is_id(op.get('lot_id'))}
+        for lot_id in sorted(lot_ids | {reservation.spot.lot_id for reservation in preloaded}):
+            lock_lot(lot_id)
+        
+        with spot_index.lock:
+            for op in operations:
+                key = op.get('idempotency_key') if isinstance(op, dict) else None
+                if key is not None and (not isinstance(key, str) or not 0 < len(key) <= max_key_length):
+                    # A key that cannot be stored would let a retry apply the operation twice
+                    results.append({'ok': False, 'op': op.get('op'),
+                                    'error': f'idempotency_key must be a string of 1 to {max_key_length} characters'})
+                    continue
+                if key in replayed:
+                    results.append(dict(replayed[key], replayed=True))
+                    continue
+                
+                result = run_batch_operation(op, session['user_id'], now, after_commit)
+                if key is not None:
+                    db.session.add(IdempotencyKey(user_id=session['user_id'], key=key, response=json.dumps(result)))
+                    replayed[key] = result
+                results.append(result)
+            
+            db.session.commit()
+            committed = True
+            for action in after_commit:
+                action()
+    except Exception:
+        if committed:
+            raise
+        db.session.rollback()
+        spot_index.invalidate()
+        app.logger.exception('Batch of %d operations rolled back', len(operations))
+        return jsonify({'error': 'Batch failed, no operations were applied'}), 500
+    
+    return jsonify({'results': results})
+
+@app.route('/api/availability')
+@read_only_route()
+def api_availability():
+    try:
+        start_time = parse_timestamp(request.args['start'])
+        end_time = parse_timestamp(request.args['end'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start and end (ISO 8601) required'}), 400
+    
+    if end_time <= start_time:
+        return jsonify({'error': 'end must be after start'}), 400
+    
+    free_spots = spot_index.lots_with_free_spot(start_time, end_time)
+    lots = read_db().query(ParkingLot).filter(ParkingLot.id.in_(list(free_spots))).all() if free_spots else []
+    return jsonify([{
+        'id': lot.id,
+        'name': lot.prime_location_name,
+        'price': lot.price,
+        'address': lot.address,
+        'pin_code': lot.pin_code
+    } for lot in lots])
+
+def quote_stay(item, rules, now):
+    """Price one /api/quote item against {lot_id: tariff rules}"""
+    lot_id = item.get('lot_id') if isinstance(item, dict) else None
+    if not _is_id(lot_id) or lot_id not in rules:
+        return {'ok': False, 'lot_id': lot_id, 'error': 'Parking lot not found'}
+    
+    try:
+        start = parse_timestamp(item['start']) if item.get('start') else now
+        if item.get('end'):
+            end = parse_timestamp(item['end'])
+        else:
+            end = start + timedelta(hours=float(item['hours']))
+        if end <= start:
+            return {'ok': False, 'lot_id': lot_id, 'error': 'end must be after start'}
+        total_cost = tariffs.bill(rules[lot_id], start, end)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return {'ok': False, 'lot_id': lot_id, 'error': 'Give start/end as ISO 8601, or numeric hours'}
+    
+    return {
+        'ok': True,
+        'lot_id': lot_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'total_cost': total_cost
+    }
+
+@app.route('/api/quote', methods=['GET', 'POST'])
+@read_only_route()
+def api_quote():
+    if request.method == 'POST':
+        payload = request.get_json(silent=True)
+        items = payload.get('quotes') if isinstance(payload, dict) else None
+        if not isinstance(items, list):
+            return jsonify({'error': 'JSON body with a "quotes" list required'}), 400
+    else:
+        # Every lot for every duration: ?lot_id=1&lot_id=2&hours=1&hours=4[&start=...]
+        items = [{'lot_id': lot_id, 'start': request.args.get('start'), 'hours': hours}
+                 for lot_id in request.args.getlist('lot_id', type=int)
+                 for hours in request.args.getlist('hours')]
+        if not items:
+            return jsonify({'error': 'lot_id and hours required'}), 400
+    
+    if len(items) > app.config['QUOTE_MAX_ITEMS']:
+        return jsonify({'error': f"At most {app.config['QUOTE_MAX_ITEMS']} quotes per request"}), 400
     
-    return jsonify(result)
+    lot_ids = {item.get('lot_id') for item in items if isinstance(item, dict) and _is_id(item.get('lot_id'))}
+    lots = read_db().query(ParkingLot).filter(ParkingLot.id.in_(lot_ids)).all() if lot_ids else []
+    rules = {lot.id: lot_tariff(lot) for lot in lots}
+    now = datetime.utcnow()
+    return jsonify({'quotes': [quote_stay(item, rules, now) for item in items]})
+
+@app.route('/api/events')
+@login_required
+@admin_required
+@read_only_route()
+def api_events():
+    after = request.args.get('after', 0, type=int)
+    limit = min(request.args.get('limit', app.config['EVENT_FEED_PAGE_SIZE'], type=int),
+                app.config['EVENT_FEED_PAGE_SIZE'])
+    events = read_db().query(BookingEvent).filter(BookingEvent.id > after).order_by(BookingEvent.id).limit(limit).all()
+    return jsonify({
+        'events': [{
+            'id': e.id,
+            'created_at': e.created_at.isoformat(),
+            'kind': e.kind,
+            'lot_id': e.lot_id,
+            'spot_id': e.spot_id,
+            'reservation_id': e.reservation_id,
+            'user_id': e.user_id,
+            'at': e.at.isoformat() if e.at else None,
+            'until': e.until.isoformat() if e.until else None,
+            'amount': e.amount,
+            'data': json.loads(e.data) if e.data else None
+        } for e in events],
+        'next': events[-1].id if events else after  # Pass as ?after= to continue the feed
+    })
+
+# Async Read-only API (ASGI)
+class AsyncReadAPI:
+    """ASGI entry point that serves the read-only JSON API on the event loop.
+
+    Each polling client is a coroutine rather than a worker thread, so thousands
+    of slow connections fit in one process. Queries run on a small pool of
+    read-only SQLite connections; all other paths (the HTML app and the booking
+    routes) are handed to the Flask app on a2wsgi's pool of wsgi_threads threads,
+    so a slow login or booking holds one thread, not the whole Flask app.
+
+    Run with: uvicorn app:asgi_app
+    """
+
+    def __init__(self, flask_app, db_workers=4, wsgi_threads=16):
+        self.flask_app = flask_app
+        self._executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix='async-api-db')
+        self._local = threading.local()
+        self._db_path = None
+        self._inflight = {}
+        self._wsgi = WSGIMiddleware(flask_app, workers=wsgi_threads) if WSGIMiddleware else None
+        self.routes = {  # Path -> (Flask endpoint it stands in for, handler)
+            '/api/parking_lots': ('api_parking_lots', self.parking_lots),
+            '/api/search_spot': ('api_search_spot', self.search_spot)
+        }
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self._db_path is None:
+                with self.flask_app.app_context():
+                    self._db_path = db.engine.url.database
+            conn = self._local.conn = sqlite3.connect(f'file:{self._db_path}?mode=ro', uri=True)
+        return conn
+
+    def _fetch(self, sql, params):
+        return self._connection().execute(sql, params).fetchall()
+
+    async def fetch(self, sql, params=()):
+        # Identical queries already in flight share one DB round trip
+        key = (sql, params)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._fetch, sql, params)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def parking_lots(self, args):
+        rows = await self.fetch(
+            "SELECT id, prime_location_name, price, address, pin_code, maximum_number_of_spots "
+            "FROM parking_lot ORDER BY id"
+        )
+        lot_ids = [row[0] for row in rows]
+        try:
+            counts = occupancy.counts(lot_ids)  # Lock-free read of the shared table
+        except Exception:
+            self.flask_app.logger.exception('Occupancy table unavailable')
+            counts = None
+        if counts is None:
+            available = dict(await self.fetch(
+                "SELECT lot_id, COUNT(*) FROM parking_spot WHERE status = 'A' GROUP BY lot_id"
+            ))
+            counts = {lot_id: (available.get(lot_id, 0), None) for lot_id in lot_ids}
+        return 200, [{
+            'id': lot_id,
+            'name': name,
+            'price': price,
+            'address': address,
+            'pin_code': pin_code,
+            'total_spots': total_spots,
+            'available_spots': counts[lot_id][0]
+        } for lot_id, name, price, address, pin_code, total_spots in rows]
+
+    async def search_spot(self, args):
+        spot_number = args.get('spot_number', [None])[0]
+        if not spot_number:
+            return 400, {'error': 'Spot number required'}
+        
+        rows = await self.fetch(
+            "SELECT s.id, s.spot_number, s.status, l.prime_location_name "
+            "FROM parking_spot s JOIN parking_lot l ON l.id = s.lot_id "
+            "WHERE s.spot_number = ? ORDER BY s.id LIMIT 1",
+            (spot_number,)
+        )
+        if not rows:
+            return 404, {'error': 'Spot not found'}
+        
+        spot_id, spot_number, status, lot_name = rows[0]
+        result = {
+            'spot_number': spot_number,
+            'status': 'Available' if status == 'A' else 'Occupied',
+            'lot_name': lot_name
+        }
+        
+        if status == 'O':
+            rows = await self.fetch(
+                "SELECT u.username, r.parking_timestamp FROM reserve_parking_spot r "
+                "JOIN user u ON u.id = r.user_id "
+                "WHERE r.spot_id = ? AND r.is_active = 1 ORDER BY r.id LIMIT 1",
+                (spot_id,)
+            )
+            if rows:
+                result['user'] = rows[0][0]
+                result['parked_since'] = rows[0][1][:19]  # Stored as 'YYYY-MM-DD HH:MM:SS.ffffff'
+        
+        return 200, result
+
+    async def _send_json(self, send, status, body, request_id=None):
+        payload = dumps_json(body)
+        headers = [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())]
+        if request_id:
+            headers.append((b'x-request-id', request_id.encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def _serve(self, route, scope, send):
+        # The same request ID header and access log line as log_access gives Flask requests
+        started = time.perf_counter()
+        endpoint, handler = route
+        request_id = dict(scope['headers']).get(b'x-request-id', b'').decode('latin-1')[:64] or os.urandom(8).hex()
+        status, body = await handler(parse_qs(scope['query_string'].decode()))
+        await self._send_json(send, status, body, request_id)
+        if self.flask_app.config['ACCESS_LOG_ENABLED']:
+            client = scope.get('client')
+            structured_log.log('parking.access', {
+                'ts': datetime.utcnow().isoformat(),
+                'request_id': request_id,
+                'user_id': None,  # Public routes; the session cookie is never read here
+                'method': scope['method'],
+                'path': scope['path'],
+                'route': endpoint,
+                'status': status,
+                'latency_ms': round((time.perf_counter() - started) * 1000, 3),
+                'sql_count': None,  # Queries are shared between concurrent requests
+                'remote_addr': client[0] if client else None,
+            })
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    # The same background services a Flask worker starts on its first request, and
+                    # the occupancy table, so its first attach (a full rebuild) is off the event loop
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(self._executor, start_expiry_scheduler)
+                    await loop.run_in_executor(self._executor, occupancy.open)
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    self._executor.shutdown(wait=False)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        
+        route = self.routes.get(scope['path']) if scope.get('method') in ('GET', 'HEAD') else None
+        if route is not None:
+            await self._serve(route, scope, send)
+        elif self._wsgi is not None:
+            await self._wsgi(scope, receive, send)
+        else:
+            await self._send_json(send, 404, {'error': 'Install a2wsgi to serve the HTML app from this entry point'})
+
+asgi_app = AsyncReadAPI(app, db_workers=app.config['ASYNC_API_DB_WORKERS'],
+                        wsgi_threads=app.config['ASYNC_API_WSGI_THREADS'])
 
 # Template Creation Helper
 def create_templates():
@@ -420,8 +3370,8 @@ def create_templates():
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{% block title %}Vehicle Parking App{% endblock %}</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
+    <link href="{{ asset_url('bootstrap/bootstrap.min.css') }}" rel="stylesheet">
+    <link href="{{ asset_url('fontawesome/css/all.min.css') }}" rel="stylesheet">
 </head>
 <body>
     <nav class="navbar navbar-expand-lg navbar-dark bg-dark">
@@ -456,7 +3406,8 @@ def create_templates():
         {% block content %}{% endblock %}
     </div>
 
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js"></script>
+    <script src="{{ asset_url('bootstrap/popper.min.js') }}"></script>
+    <script src="{{ asset_url('bootstrap/bootstrap.min.js') }}"></script>
 </body>
 </html>'''
 
@@ -640,21 +3591,8 @@ def create_templates():
             </tr>
         </thead>
         <tbody>
-            {% for lot in parking_lots %}
-            <tr>
-                <td>{{ lot.prime_location_name }}</td>
-                <td>{{ lot.address }}, {{ lot.pin_code }}</td>
-                <td>₹{{ lot.price }}</td>
-                <td>{{ lot.maximum_number_of_spots }}</td>
-                <td>{{ lot.spots|selectattr("status", "equalto", "A")|list|length }}</td>
-                <td>
-                    <a href="{{ url_for('view_spots', lot_id=lot.id) }}" class="btn btn-sm btn-info">View Spots</a>
-                    <a href="{{ url_for('edit_parking_lot', lot_id=lot.id) }}" class="btn btn-sm btn-warning">Edit</a>
-                    <a href="{{ url_for('delete_parking_lot', lot_id=lot.id) }}" 
-                       class="btn btn-sm btn-danger"
-                       onclick="return confirm('Are you sure?')">Delete</a>
-                </td>
-            </tr>
+            {% for row in lot_rows %}
+{{ row }}
             {% endfor %}
         </tbody>
     </table>
@@ -698,6 +3636,29 @@ def create_templates():
             </div>
         </div>
     </div>
+    <h5>Tariff <small class="text-muted">(optional, local time)</small></h5>
+    <div class="row">
+        <div class="col-md-3 mb-3">
+            <label class="form-label">Peak Price per Hour (₹)</label>
+            <input type="number" step="0.01" min="0" class="form-control" name="peak_price">
+        </div>
+        <div class="col-md-3 mb-3">
+            <label class="form-label">Weekday Peak Hours</label>
+            <div class="input-group">
+                <input type="number" min="0" max="24" class="form-control" name="peak_start_hour" value="8">
+                <span class="input-group-text">to</span>
+                <input type="number" min="0" max="24" class="form-control" name="peak_end_hour" value="20">
+            </div>
+        </div>
+        <div class="col-md-3 mb-3">
+            <label class="form-label">Weekend Price per Hour (₹)</label>
+            <input type="number" step="0.01" min="0" class="form-control" name="weekend_price">
+        </div>
+        <div class="col-md-3 mb-3">
+            <label class="form-label">Daily Cap (₹)</label>
+            <input type="number" step="0.01" min="0" class="form-control" name="daily_cap">
+        </div>
+    </div>
     <button type="submit" class="btn btn-primary">Create Parking Lot</button>
     <a href="{{ url_for('admin_dashboard') }}" class="btn btn-secondary">Cancel</a>
 </form>
@@ -732,6 +3693,29 @@ def create_templates():
             </div>
         </div>
     </div>
+    <h5>Tariff <small class="text-muted">(optional, local time)</small></h5>
+    <div class="row">
+        <div class="col-md-3 mb-3">
+            <label class="form-label">Peak Price per Hour (₹)</label>
+            <input type="number" step="0.01" min="0" class="form-control" name="peak_price" value="{{ '' if lot.peak_price is none else lot.peak_price }}">
+        </div>
+        <div class="col-md-3 mb-3">
+            <label class="form-label">Weekday Peak Hours</label>
+            <div class="input-group">
+                <input type="number" min="0" max="24" class="form-control" name="peak_start_hour" value="{{ 8 if lot.peak_start_hour is none else lot.peak_start_hour }}">
+                <span class="input-group-text">to</span>
+                <input type="number" min="0" max="24" class="form-control" name="peak_end_hour" value="{{ 20 if lot.peak_end_hour is none else lot.peak_end_hour }}">
+            </div>
+        </div>
+        <div class="col-md-3 mb-3">
+            <label class="form-label">Weekend Price per Hour (₹)</label>
+            <input type="number" step="0.01" min="0" class="form-control" name="weekend_price" value="{{ '' if lot.weekend_price is none else lot.weekend_price }}">
+        </div>
+        <div class="col-md-3 mb-3">
+            <label class="form-label">Daily Cap (₹)</label>
+            <input type="number" step="0.01" min="0" class="form-control" name="daily_cap" value="{{ '' if lot.daily_cap is none else lot.daily_cap }}">
+        </div>
+    </div>
     <button type="submit" class="btn btn-primary">Update Parking Lot</button>
     <a href="{{ url_for('admin_dashboard') }}" class="btn btn-secondary">Cancel</a>
 </form>
@@ -826,7 +3810,10 @@ def create_templates():
 {% block content %}
 <div class="d-flex justify-content-between align-items-center mb-4">
     <h2><i class="fas fa-users"></i> Registered Users</h2>
-    <a href="{{ url_for('admin_dashboard') }}" class="btn btn-secondary">Back to Dashboard</a>
+    <div>
+        <a href="{{ url_for('import_users') }}" class="btn btn-primary"><i class="fas fa-file-import"></i> Import Users</a>
+        <a href="{{ url_for('admin_dashboard') }}" class="btn btn-secondary">Back to Dashboard</a>
+    </div>
 </div>
 
 <div class="table-responsive">
@@ -861,6 +3848,124 @@ def create_templates():
     </table>
 </div>
 {% endblock %}''',
+        'import_users.html': '''{% extends "base.html" %}
+{% block content %}
+<div class="d-flex justify-content-between align-items-center mb-4">
+    <h2><i class="fas fa-file-import"></i> Import Users</h2>
+    <a href="{{ url_for('view_users') }}" class="btn btn-secondary">Back to Users</a>
+</div>
+
+<form method="POST" enctype="multipart/form-data" class="mb-4">
+    <div class="mb-3">
+        <label class="form-label">CSV or JSON file</label>
+        <input type="file" class="form-control" name="file" accept=".csv,.json" required>
+        <div class="form-text">
+            CSV needs a header row: <code>username,email,phone,password</code>.
+            JSON is a list of objects with the same keys.
+        </div>
+    </div>
+    <button type="submit" class="btn btn-primary">Import</button>
+</form>
+
+{% if job and job.status in ('queued', 'running') %}
+<meta http-equiv="refresh" content="2">
+<div class="alert alert-info">
+    Importing: {{ job.processed }} of {{ job.total }} records processed, {{ job.created }} users created so far.
+    This page refreshes until the import finishes.
+</div>
+{% elif job and job.status == 'failed' %}
+<div class="alert alert-danger">
+    The import failed after creating {{ job.created }} users: {{ job.error }}
+</div>
+{% elif job %}
+<div class="alert alert-info">
+    Created {{ job.created }} users, skipped {{ job.skipped|length }}.
+</div>
+{% if job.skipped %}
+<div class="table-responsive">
+    <table class="table table-striped">
+        <thead>
+            <tr>
+                <th>Row</th>
+                <th>Username</th>
+                <th>Reason</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for skip in job.skipped[:500] %}
+            <tr>
+                <td>{{ skip.row }}</td>
+                <td>{{ skip.username or '' }}</td>
+                <td>{{ skip.error }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+</div>
+{% endif %}
+{% endif %}
+{% endblock %}''',
+        'lot_card.html': '''            <div class="col-md-6 mb-3">
+                <div class="card">
+                    <div class="card-body">
+                        <h5 class="card-title">{{ lot.prime_location_name }}</h5>
+                        <p class="card-text">
+                            <small class="text-muted">{{ lot.address }}</small><br>
+                            <strong>Rate:</strong> ₹{{ lot.price }}/hour<br>
+                            {% if lot.peak_price is not none %}
+                            <strong>Peak:</strong> ₹{{ lot.peak_price }}/hour, {{ lot.peak_start_hour }}:00-{{ lot.peak_end_hour }}:00 weekdays<br>
+                            {% endif %}
+                            {% if lot.weekend_price is not none %}
+                            <strong>Weekends:</strong> ₹{{ lot.weekend_price }}/hour<br>
+                            {% endif %}
+                            {% if lot.daily_cap is not none %}
+                            <strong>Daily cap:</strong> ₹{{ lot.daily_cap }}<br>
+                            {% endif %}
+                            <strong>Available Spots:</strong> {{ available_spots }}/{{ lot.maximum_number_of_spots }}
+                        </p>
+                        {% if available_spots > 0 %}
+                            <form method="GET" action="{{ url_for('book_spot', lot_id=lot.id) }}" class="d-flex gap-2"
+                                  onsubmit="return confirm('Book a spot at {{ lot.prime_location_name }}?')">
+                                <select name="hours" class="form-select form-select-sm w-auto">
+                                    <option value="">Until released</option>
+                                    <option value="1">1 hour</option>
+                                    <option value="2">2 hours</option>
+                                    <option value="4">4 hours</option>
+                                    <option value="8">8 hours</option>
+                                    <option value="24">24 hours</option>
+                                </select>
+                                <button type="submit" class="btn btn-success btn-sm">Book Spot</button>
+                            </form>
+                        {% else %}
+                            <button class="btn btn-secondary btn-sm" disabled>No Spots Available</button>
+                        {% endif %}
+                        <details class="mt-2">
+                            <summary class="small">Reserve ahead</summary>
+                            <form method="POST" action="{{ url_for('reserve_ahead', lot_id=lot.id) }}" class="mt-2">
+                                <label class="form-label small mb-0">From (UTC)</label>
+                                <input type="datetime-local" class="form-control form-control-sm mb-1" name="start_time" required>
+                                <label class="form-label small mb-0">To (UTC)</label>
+                                <input type="datetime-local" class="form-control form-control-sm mb-2" name="end_time" required>
+                                <button type="submit" class="btn btn-outline-success btn-sm">Reserve</button>
+                            </form>
+                        </details>
+                    </div>
+                </div>
+            </div>''',
+        'lot_row.html': '''            <tr>
+                <td>{{ lot.prime_location_name }}</td>
+                <td>{{ lot.address }}, {{ lot.pin_code }}</td>
+                <td>₹{{ lot.price }}</td>
+                <td>{{ lot.maximum_number_of_spots }}</td>
+                <td>{{ available_spots }}</td>
+                <td>
+                    <a href="{{ url_for('view_spots', lot_id=lot.id) }}" class="btn btn-sm btn-info">View Spots</a>
+                    <a href="{{ url_for('edit_parking_lot', lot_id=lot.id) }}" class="btn btn-sm btn-warning">Edit</a>
+                    <a href="{{ url_for('delete_parking_lot', lot_id=lot.id) }}" 
+                       class="btn btn-sm btn-danger"
+                       onclick="return confirm('Are you sure?')">Delete</a>
+                </td>
+            </tr>''',
         'user_dashboard.html': '''{% extends "base.html" %}
 {% block content %}
 <h2><i class="fas fa-user"></i> User Dashboard</h2>
@@ -876,6 +3981,7 @@ def create_templates():
                         <th>Spot Number</th>
                         <th>Location</th>
                         <th>Parked Since</th>
+                        <th>Expires</th>
                         <th>Rate/Hour</th>
                         <th>Action</th>
                     </tr>
@@ -886,6 +3992,14 @@ def create_templates():
                         <td>{{ reservation.spot.spot_number }}</td>
                         <td>{{ reservation.spot.lot.prime_location_name }}</td>
                         <td>{{ reservation.parking_timestamp.strftime('%Y-%m-%d %H:%M') }}</td>
+                        <td>
+                            {% if reservation.expires_at %}
+                                {{ reservation.expires_at.strftime('%Y-%m-%d %H:%M') }}
+                                {% if reservation.overstayed %}<span class="badge bg-danger">Overstay</span>{% endif %}
+                            {% else %}
+                                -
+                            {% endif %}
+                        </td>
                         <td>₹{{ reservation.parking_cost_per_hour }}</td>
                         <td>
                             <a href="{{ url_for('release_spot', reservation_id=reservation.id) }}" 
@@ -903,33 +4017,53 @@ def create_templates():
 </div>
 {% endif %}
 
+{% if advance_reservations %}
+<div class="row mb-4">
+    <div class="col-12">
+        <h4>Upcoming Reservations</h4>
+        <div class="table-responsive">
+            <table class="table table-bordered">
+                <thead>
+                    <tr>
+                        <th>Spot Number</th>
+                        <th>Location</th>
+                        <th>From</th>
+                        <th>To</th>
+                        <th>Rate/Hour</th>
+                        <th>Action</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for hold in advance_reservations %}
+                    <tr>
+                        <td>{{ hold.spot.spot_number }}</td>
+                        <td>{{ hold.spot.lot.prime_location_name }}</td>
+                        <td>{{ hold.start_time.strftime('%Y-%m-%d %H:%M') }}</td>
+                        <td>{{ hold.end_time.strftime('%Y-%m-%d %H:%M') }}</td>
+                        <td>₹{{ hold.parking_cost_per_hour }}</td>
+                        <td>
+                            <a href="{{ url_for('check_in', advance_id=hold.id) }}" class="btn btn-sm btn-success">Check In</a>
+                            <a href="{{ url_for('cancel_advance', advance_id=hold.id) }}" 
+                               class="btn btn-sm btn-outline-danger"
+                               onclick="return confirm('Cancel this reservation?')">
+                                Cancel
+                            </a>
+                        </td>
+                    </tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+        </div>
+    </div>
+</div>
+{% endif %}
+
 <div class="row">
     <div class="col-md-8">
         <h4>Available Parking Lots</h4>
         <div class="row">
-            {% for lot in parking_lots %}
-            {% set available_spots = lot.spots|selectattr("status", "equalto", "A")|list|length %}
-            <div class="col-md-6 mb-3">
-                <div class="card">
-                    <div class="card-body">
-                        <h5 class="card-title">{{ lot.prime_location_name }}</h5>
-                        <p class="card-text">
-                            <small class="text-muted">{{ lot.address }}</small><br>
-                            <strong>Rate:</strong> ₹{{ lot.price }}/hour<br>
-                            <strong>Available Spots:</strong> {{ available_spots }}/{{ lot.maximum_number_of_spots }}
-                        </p>
-                        {% if available_spots > 0 %}
-                            <a href="{{ url_for('book_spot', lot_id=lot.id) }}" 
-                               class="btn btn-success btn-sm"
-                               onclick="return confirm('Book a spot at {{ lot.prime_location_name }}?')">
-                                Book Spot
-                            </a>
-                        {% else %}
-                            <button class="btn btn-secondary btn-sm" disabled>No Spots Available</button>
-                        {% endif %}
-                    </div>
-                </div>
-            </div>
+            {% for card in lot_cards %}
+{{ card }}
             {% endfor %}
         </div>
     </div>
@@ -966,15 +4100,25 @@ if __name__ == '__main__':
         # Create database tables
         db.create_all()
         
+        # Add columns introduced since the database was created
+        upgrade_schema()
+        
         # Create admin user
         create_admin()
         
+        # Base snapshot for replaying the booking event log
+        event_log.ensure_baseline()
+        
         # Create templates
         create_templates()
         
+        # Fingerprint and precompress static assets
+        build_assets()
+        
         print(" Database created successfully!")
         print(" Admin user created (username: admin, password: admin123)")
         print(" Templates created successfully!")
+        print(" Static assets built successfully!")
         print(" Starting Flask application...")
     
     app.run(debug=True)
\ No newline at end of file
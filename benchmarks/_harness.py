@@ -0,0 +1,55 @@
+"""Shared setup for the benchmark scripts.
+
+Each benchmark runs against a throwaway copy of the app in a temporary
+directory, so it never touches the real instance folder or database.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_app(workdir=None):
+    """Copy app.py, templates and static into a scratch directory and import the app from there"""
+    workdir = workdir or tempfile.mkdtemp(prefix='parking-bench-')
+    shutil.copy(os.path.join(REPO_DIR, 'app.py'), workdir)
+    for folder in ('templates', 'static'):
+        if os.path.isdir(os.path.join(REPO_DIR, folder)):
+            shutil.copytree(os.path.join(REPO_DIR, folder), os.path.join(workdir, folder), dirs_exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    import app as module
+    module.app.config['ADMISSION_CONTROL_ENABLED'] = False  # Benchmarks hammer one user and IP
+    return module
+
+def seed(m, lots, spots_per_lot, users=('driver',), occupied_every=0):
+    """Create the tables, the admin, some users (password 'p') and lots with spots, using bulk inserts"""
+    from werkzeug.security import generate_password_hash
+    
+    with m.app.app_context():
+        m.db.create_all()
+        m.create_admin()
+        password_hash = generate_password_hash('p', method='pbkdf2:sha256:1000')  # Fast to check
+        m.db.session.execute(m.User.__table__.insert(), [
+            {'username': name, 'email': f'{name}@example.com', 'phone': '1', 'password_hash': password_hash}
+            for name in users
+        ])
+        m.db.session.execute(m.ParkingLot.__table__.insert(), [
+            {'id': i + 1, 'prime_location_name': f'Lot {i}', 'price': 10.0, 'address': f'{i} Main Street',
+             'pin_code': '560001', 'maximum_number_of_spots': spots_per_lot, 'version': 1}
+            for i in range(lots)
+        ])
+        m.db.session.execute(m.ParkingSpot.__table__.insert(), [
+            {'lot_id': i + 1, 'spot_number': f'L{i}-{j:03d}',
+             'status': 'O' if occupied_every and j % occupied_every == 0 else 'A'}
+            for i in range(lots) for j in range(spots_per_lot)
+        ])
+        m.db.session.commit()
+        m.occupancy.rebuild()
+        return m.db.engine.url.database
+
+def login(m, username):
+    client = m.app.test_client()
+    client.post('/login', data={'username': username, 'password': 'admin123' if username == 'admin' else 'p'})
+    return client
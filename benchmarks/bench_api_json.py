@@ -0,0 +1,85 @@
+"""JSON encoding of /api/parking_lots at 10k lots (user-039).
+
+Compares the old handler (ORM objects passed to jsonify, registered here as
+/bench/parking_lots_orm) with the projection query, encoded by the stdlib
+encoder or orjson, buffered or streamed. Every variant must produce the same
+document. Reports median and best time over interleaved runs and the
+tracemalloc peak of one request.
+
+Usage: python benchmarks/bench_api_json.py [lots=10000] [spots_per_lot=10] [runs=25]
+"""
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from _harness import load_app, seed
+
+LOTS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+SPOTS_PER_LOT = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+RUNS = int(sys.argv[3]) if len(sys.argv) > 3 else 25
+
+def main():
+    m = load_app()
+    seed(m, lots=LOTS, spots_per_lot=SPOTS_PER_LOT, occupied_every=3)
+
+    @m.app.route('/bench/parking_lots_orm')
+    @m.read_only_route()
+    def parking_lots_orm():
+        lots = m.read_db().query(m.ParkingLot).all()
+        availability = m.available_spot_counts(lot.id for lot in lots)
+        return m.jsonify([{
+            'id': lot.id,
+            'name': lot.prime_location_name,
+            'price': lot.price,
+            'address': lot.address,
+            'pin_code': lot.pin_code,
+            'total_spots': lot.maximum_number_of_spots,
+            'available_spots': availability[lot.id][0]
+        } for lot in lots])
+
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    encoders = {'stdlib': lambda obj: encoder.encode(obj).encode()}
+    if m.orjson is not None:
+        encoders['orjson'] = m.orjson.dumps
+    else:
+        print('orjson not installed; timing the stdlib encoder only')
+
+    cases = [('ORM + jsonify (before)', '/bench/parking_lots_orm', encoders['stdlib'], False)]
+    for name, dumps in encoders.items():
+        for streamed in (False, True):
+            cases.append((f"projection + {name}, {'streamed' if streamed else 'buffered'}",
+                          '/api/parking_lots', dumps, streamed))
+
+    client = m.app.test_client()
+    def run(path, dumps, streamed):
+        m.dumps_json = dumps
+        m.app.config['API_STREAM_MIN_ITEMS'] = 1000 if streamed else 10 ** 9
+        started = time.perf_counter()
+        body = client.get(path).data
+        return time.perf_counter() - started, body
+
+    expected = json.loads(run(*cases[0][1:])[1])
+    for name, *case in cases[1:]:
+        assert json.loads(run(*case)[1]) == expected, name
+
+    times = {name: [] for name, *_ in cases}
+    for attempt in range(3 + RUNS):  # The first three rounds warm up
+        for name, *case in cases:
+            elapsed = run(*case)[0]
+            if attempt >= 3:
+                times[name].append(elapsed)
+
+    print(f'{LOTS} lots x {SPOTS_PER_LOT} spots, {RUNS} interleaved runs')
+    print(f"  {'':32} {'p50':>9} {'min':>9} {'peak':>9}")
+    for name, *case in cases:
+        tracemalloc.start()
+        run(*case)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'  {name:32} {statistics.median(times[name]) * 1000:6.1f} ms {min(times[name]) * 1000:6.1f} ms '
+              f'{peak / 1e6:6.1f} MB')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Concurrency of the ASGI entry point (user-029).
+
+1. Bridge: N concurrent Flask requests that each block for 0.5 s, sent through
+   asgi_app's pass-through. With a real thread pool they overlap (~0.5 s total);
+   on a single shared thread they queue (~N * 0.5 s).
+2. Slow clients: many /api/parking_lots clients that stall 1 s mid-request,
+   while /login is probed, against `uvicorn app:asgi_app` and, for comparison,
+   `gunicorn --threads 8 app:app` (each skipped if not installed).
+
+Usage: python benchmarks/bench_asgi.py [slow_clients=2000]
+"""
+import asyncio
+import shutil
+import subprocess
+import sys
+import time
+
+from _harness import load_app, seed
+
+SLOW_CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+async def bridge_benchmark(m, concurrent=4, block=0.5):
+    @m.app.route('/bench/block')
+    def bench_block():
+        time.sleep(block)
+        return 'ok'
+
+    async def call():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        async def receive():
+            return messages.pop() if messages else {'type': 'http.disconnect'}
+        async def send(message):
+            pass
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                 'scheme': 'http', 'path': '/bench/block', 'raw_path': b'/bench/block', 'query_string': b'',
+                 'root_path': '', 'headers': [(b'host', b'bench')], 'server': ('bench', 80), 'client': ('127.0.0.1', 1)}
+        await m.asgi_app(scope, receive, send)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[call() for _ in range(concurrent)])
+    print(f'bridge: {concurrent} concurrent {block}s Flask requests took {time.perf_counter() - started:.2f}s')
+
+async def slow_client(port, latencies):
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /api/parking_lots HTTP/1.1\r\nHost: bench\r\n')
+        await writer.drain()
+        await asyncio.sleep(1.0)  # A signboard on a poor link
+        writer.write(b'Connection: close\r\n\r\n')
+        await writer.drain()
+        ok = (await reader.read()).startswith(b'HTTP/1.1 200')
+        writer.close()
+    except OSError:
+        ok = False
+    latencies.append(time.perf_counter() - started)
+    return ok
+
+async def login_probe(port, latencies):
+    await asyncio.sleep(0.3)
+    for _ in range(5):
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /login HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n')
+        await writer.drain()
+        await reader.read()
+        writer.close()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.2)
+
+async def slow_clients_benchmark(label, port):
+    latencies, probes = [], []
+    started = time.perf_counter()
+    results = await asyncio.gather(*[slow_client(port, latencies) for _ in range(SLOW_CLIENTS)],
+                                   login_probe(port, probes))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f'{label}: {sum(results[:-1])}/{SLOW_CLIENTS} ok in {elapsed:.1f}s, '
+          f'p50 {latencies[len(latencies) // 2]:.2f}s, p99 {latencies[int(len(latencies) * 0.99)]:.2f}s; '
+          f'/login during load: max {max(probes) * 1000:.0f} ms')
+
+def serve(command, port):
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            asyncio.run(asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 1))
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{command[0]} did not start')
+
+def main():
+    m = load_app()
+    seed(m, lots=50, spots_per_lot=20, occupied_every=3)
+    if m.WSGIMiddleware is None:
+        print('bridge: skipped (pip install a2wsgi)')
+    else:
+        asyncio.run(bridge_benchmark(m))
+
+    servers = [
+        ('uvicorn app:asgi_app', 'uvicorn', ['uvicorn', 'app:asgi_app', '--port', '5401', '--log-level', 'error'], 5401),
+        ('gunicorn --threads 8', 'gunicorn', ['gunicorn', '-w', '1', '--threads', '8', '-b', '127.0.0.1:5402', 'app:app'], 5402),
+    ]
+    for label, executable, command, port in servers:
+        if not shutil.which(executable):
+            print(f'{label}: skipped ({executable} not installed)')
+            continue
+        process = serve(command, port)
+        try:
+            asyncio.run(slow_clients_benchmark(label, port))
+        finally:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()
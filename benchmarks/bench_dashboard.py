@@ -0,0 +1,46 @@
+"""Dashboard render time with many lots (user-032).
+
+Renders /user/dashboard and /admin/dashboard with the fragment cache disabled
+(every lot card and row rendered on each request; this also pays for the
+misses and puts, so it is slower than the pre-cache templates were) and
+enabled, then times the request right after a booking, which should only
+re-render the affected lot's card.
+
+Usage: python benchmarks/bench_dashboard.py [lots=1000] [spots_per_lot=5] [repeat=10]
+"""
+import sys
+import time
+
+from _harness import load_app, login, seed
+
+LOTS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+SPOTS_PER_LOT = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+REPEAT = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+def timed(client, path):
+    started = time.perf_counter()
+    response = client.get(path)
+    assert response.status_code == 200, (path, response.status_code)
+    return time.perf_counter() - started
+
+def main():
+    m = load_app()
+    seed(m, lots=LOTS, spots_per_lot=SPOTS_PER_LOT)
+    driver, admin = login(m, 'driver'), login(m, 'admin')
+    max_bytes = m.fragment_cache.max_bytes
+
+    print(f'{LOTS} lots x {SPOTS_PER_LOT} spots, mean of {REPEAT} warm requests')
+    for path, client in [('/user/dashboard', driver), ('/admin/dashboard', admin)]:
+        results = []
+        for label, cache_bytes in [('uncached', 0), ('cached', max_bytes)]:
+            m.fragment_cache.max_bytes = cache_bytes
+            timed(client, path)  # Warm up (and fill the cache)
+            results.append((label, sum(timed(client, path) for _ in range(REPEAT)) / REPEAT))
+        print(f'  {path:17} ' + ', '.join(f'{label} {seconds * 1000:.1f} ms' for label, seconds in results))
+
+    driver.get('/user/book_spot/1?hours=2')
+    print(f'  /user/dashboard after a booking: {timed(driver, "/user/dashboard") * 1000:.1f} ms')
+    print(f'  cache: {m.fragment_cache.stats()}')
+
+if __name__ == '__main__':
+    main()
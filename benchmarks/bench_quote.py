@@ -0,0 +1,101 @@
+"""Tariff quotes: correctness against a minute-by-minute walk, then throughput (user-037).
+
+First bills random stays (peak windows inside and across midnight, weekend
+rates, daily caps, stays from a minute to three weeks) with the compiled
+tariff engine and with a reference that walks each stay one local minute
+at a time; any difference above a paisa is printed and fails the run. Then
+times the engine on 1M stays over 100 rule sets, and /api/quote with 10k
+quotes per request (JSON and ISO 8601 parsing included).
+
+Usage: python benchmarks/bench_quote.py [stays=1000000] [checks=400]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from _harness import load_app, login, seed
+
+STAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+CHECKS = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+LOTS = 100
+QUOTES_PER_REQUEST = 10_000
+
+def minute_walk(rules, start, end, offset_minutes):
+    """Reference bill: the rate in force for every local minute, summed per local day and capped"""
+    rate, peak_price, peak_start, peak_end, weekend_price, daily_cap = rules
+    t = start + timedelta(minutes=offset_minutes)
+    stop = max(end, start + timedelta(hours=1)) + timedelta(minutes=offset_minutes)
+    per_day = {}
+    while t < stop:
+        step = min(stop, t.replace(second=0, microsecond=0) + timedelta(minutes=1))
+        hour, weekday = t.hour, t.weekday()
+        if weekday >= 5 and weekend_price is not None:
+            price = weekend_price
+        elif weekday < 5 and peak_price is not None and (
+                peak_start <= hour < peak_end if peak_start <= peak_end else hour >= peak_start or hour < peak_end):
+            price = peak_price
+        else:
+            price = rate
+        per_day[t.date()] = per_day.get(t.date(), 0) + price * (step - t).total_seconds() / 3600
+        t = step
+    return round(sum(v if daily_cap is None else min(daily_cap, v) for v in per_day.values()), 2)
+
+def random_rules(rnd):
+    peak_price = rnd.choice([None, 20.0])
+    return (rnd.choice([10.0, 12.5]), peak_price,
+            rnd.choice([8, 22]) if peak_price else None, rnd.choice([20, 6]) if peak_price else None,
+            rnd.choice([None, 5.0]), rnd.choice([None, 60.0, 150.0]))
+
+def main():
+    m = load_app()
+    offset = m.app.config['TARIFF_UTC_OFFSET_MINUTES']
+    rnd = random.Random(7)
+
+    mismatches = 0
+    for _ in range(CHECKS):
+        rules = random_rules(rnd)
+        start = datetime(2025, 3, 1) + timedelta(minutes=rnd.randint(0, 60 * 24 * 30), seconds=rnd.randint(0, 59))
+        end = start + timedelta(minutes=rnd.choice([rnd.randint(1, 180), rnd.randint(1, 60 * 24 * 20)]))
+        billed, expected = m.tariffs.bill(rules, start, end), minute_walk(rules, start, end, offset)
+        if abs(billed - expected) > 0.011:
+            mismatches += 1
+            print(f'  MISMATCH {rules} {start} -> {end}: engine {billed}, minute walk {expected}')
+    print(f'{CHECKS} random stays against the minute walk: {mismatches} mismatches')
+
+    rule_sets = [random_rules(rnd) for _ in range(LOTS)]
+    base = datetime(2025, 1, 1)
+    stays = []
+    for i in range(STAYS):
+        start = base + timedelta(seconds=rnd.randint(0, 365 * 86400))
+        minutes = rnd.choice((rnd.randint(10, 600), rnd.randint(600, 4320)))
+        stays.append((rule_sets[i % LOTS], start, start + timedelta(minutes=minutes)))
+    bill = m.tariffs.bill
+    started = time.perf_counter()
+    for rules, start, end in stays:
+        bill(rules, start, end)
+    elapsed = time.perf_counter() - started
+    print(f'engine: {STAYS} stays in {elapsed:.2f} s ({elapsed / STAYS * 1e6:.2f} us each)')
+
+    seed(m, lots=LOTS, spots_per_lot=1)
+    with m.app.app_context():
+        for lot_id, rules in enumerate(rule_sets, start=1):
+            m.db.session.execute(m.update(m.ParkingLot).where(m.ParkingLot.id == lot_id).values(
+                price=rules[0], peak_price=rules[1], peak_start_hour=rules[2], peak_end_hour=rules[3],
+                weekend_price=rules[4], daily_cap=rules[5]))
+        m.db.session.commit()
+    client = login(m, 'driver')
+    quotes = [{'lot_id': 1 + i % LOTS, 'start': (base + timedelta(hours=i)).isoformat(), 'hours': 1 + i % 30}
+              for i in range(QUOTES_PER_REQUEST)]
+    client.post('/api/quote', json={'quotes': quotes})  # Warm up
+    started = time.perf_counter()
+    for _ in range(5):
+        response = client.post('/api/quote', json={'quotes': quotes})
+        assert response.status_code == 200 and all(q['ok'] for q in response.get_json()['quotes'])
+    elapsed = (time.perf_counter() - started) / 5
+    print(f'/api/quote: {QUOTES_PER_REQUEST} quotes per request in {elapsed * 1000:.0f} ms '
+          f'({QUOTES_PER_REQUEST / elapsed / 1000:.0f}k quotes/s)')
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
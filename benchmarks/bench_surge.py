@@ -0,0 +1,119 @@
+"""Goodput under a login/booking surge, with and without admission control (user-033).
+
+48 clients loop over login (a scrypt password check) and book_spot against
+one server process with 64 threads. A request counts as good if it
+succeeds within 2 s. Rate limits are raised so only the concurrency cap is
+exercised. Runs under gunicorn when it is installed, otherwise on
+Werkzeug's threaded server.
+
+Usage: python benchmarks/bench_surge.py [clients=48] [seconds=12]
+"""
+import http.cookiejar
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from _harness import load_app, seed
+
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 12
+DEADLINE = 2.0
+LOTS = 4
+
+SERVER_MODULE = '''import os
+import app as module
+app = module.app
+app.config['ADMISSION_CONTROL_ENABLED'] = os.environ['BENCH_ADMISSION'] == 'on'
+app.config['RATE_LIMITS'] = {kind: (100_000, 100_000) for kind in app.config['RATE_LIMITS']}
+'''
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+def client(base, number, stats):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+    login = urllib.parse.urlencode({'username': f'driver{number}', 'password': 'p'}).encode()
+    deadline = time.time() + SECONDS
+    while time.time() < deadline:
+        for request in (urllib.request.Request(f'{base}/login', data=login),
+                        urllib.request.Request(f'{base}/user/book_spot/{random.randint(1, LOTS)}')):
+            started = time.perf_counter()
+            location = ''
+            try:
+                status = opener.open(request, timeout=10).status
+            except urllib.error.HTTPError as e:
+                status, location = e.code, e.headers.get('Location', '')
+            except OSError:
+                status = 0
+            elapsed = time.perf_counter() - started
+            good = status == 302 and not location.endswith('/login') and elapsed <= DEADLINE
+            with stats['lock']:
+                stats['latencies'].append(elapsed)
+                stats['good' if good else 'bad'] += 1
+            if status in (429, 503):
+                time.sleep(0.2)  # Clients honour the rejection instead of hammering
+
+def surge(base):
+    stats = {'lock': threading.Lock(), 'latencies': [], 'good': 0, 'bad': 0}
+    threads = [threading.Thread(target=client, args=(base, i, stats)) for i in range(CLIENTS)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+    latencies = sorted(stats['latencies'])
+    return (f"goodput {stats['good'] / elapsed:.1f} req/s ({stats['good']} good, {stats['bad']} failed or late), "
+            f"p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms")
+
+def wait_for(port):
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+def main():
+    m = load_app()
+    seed(m, lots=LOTS, spots_per_lot=400, users=[f'driver{i}' for i in range(CLIENTS)])
+    with m.app.app_context():  # Real password hashes, so logins cost what they do in production
+        m.db.session.execute(m.update(m.User).where(m.User.username != 'admin').values(
+            password_hash=m.generate_password_hash('p')))
+        m.db.session.commit()
+    with open('bench_surge_server.py', 'w') as f:
+        f.write(SERVER_MODULE)
+
+    use_gunicorn = shutil.which('gunicorn') is not None
+    print(f"{CLIENTS} clients, {SECONDS:.0f}s per run, {'gunicorn -w 1 --threads 64' if use_gunicorn else 'werkzeug threaded'}")
+    for port, mode in ((5310, 'off'), (5311, 'on')):
+        os.environ['BENCH_ADMISSION'] = mode
+        if use_gunicorn:
+            process = subprocess.Popen(['gunicorn', '-w', '1', '--threads', '64', '-b', f'127.0.0.1:{port}',
+                                        'bench_surge_server:app'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            from werkzeug.serving import make_server
+            exec(SERVER_MODULE, {})
+            server = make_server('127.0.0.1', port, m.app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            wait_for(port)
+            print(f'  admission control {mode:3}: {surge(f"http://127.0.0.1:{port}")}')
+        finally:
+            if use_gunicorn:
+                process.terminate()
+                process.wait()
+            else:
+                server.shutdown()
+
+if __name__ == '__main__':
+    main()